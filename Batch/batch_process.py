@@ -0,0 +1,164 @@
+"""
+Headless batch processing.
+
+    python -m Batch.batch_process photos/ --recipe recipe.json --output out/
+    python -m Batch.batch_process "scans/*.jpg" --recipe recipe.yaml --output out/ --workers 8
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+
+from Batch.recipe import load_recipe, apply_recipe
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.tif', '.tiff', '.webp')
+
+def collect_files(inputs, recursive=False):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive)
+
+        for path in sorted(candidates):
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(path)
+
+    # ตัดไฟล์ซ้ำแต่คงลำดับเดิมไว้
+    return list(dict.fromkeys(files))
+
+def output_paths(files, output_dir, out_format=None):
+    """
+    Output path for every input file.
+
+    Each file keeps its path relative to the folder shared by all inputs, so
+    a/img.jpg and b/img.jpg (e.g. from --recursive) go to out/a/img.jpg and
+    out/b/img.jpg. Raises ValueError when two inputs would still end up at
+    the same path (e.g. img.png and img.jpg with --format .png).
+    """
+    dirs = [os.path.dirname(os.path.abspath(path)) for path in files]
+    try:
+        root = os.path.commonpath(dirs) if dirs else ''
+    except ValueError:
+        # อยู่คนละไดรฟ์ ไม่มีโฟลเดอร์ร่วม
+        root = None
+
+    outputs = []
+    seen = {}
+    for path in files:
+        if root is None:
+            relative = os.path.basename(path)
+        else:
+            relative = os.path.relpath(os.path.abspath(path), root)
+        stem, ext = os.path.splitext(relative)
+        out_path = os.path.join(output_dir, stem + (out_format or ext))
+
+        key = os.path.normcase(out_path)
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {path} would both be written to {out_path}")
+        seen[key] = path
+        outputs.append(out_path)
+    return outputs
+
+# ตัวแปรของ worker process แต่ละตัว (ตั้งค่าครั้งเดียวใน initializer)
+_worker_steps = None
+
+def _init_worker(steps):
+    global _worker_steps
+    _worker_steps = steps
+    # แต่ละ process ใช้ 1 thread ของ OpenCV เพื่อไม่ให้แย่ง core กันเอง
+    cv2.setNumThreads(1)
+
+def process_file(job):
+    path, out_path = job
+    start = time.perf_counter()
+    size = os.path.getsize(path)
+    try:
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError("unable to read image")
+
+        result = apply_recipe(img, _worker_steps)
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if not cv2.imwrite(out_path, result):
+            raise ValueError(f"unable to write {out_path}")
+        error = None
+    except Exception as e:
+        error = str(e)
+
+    return path, size, time.perf_counter() - start, error
+
+def run_batch(files, steps, output_dir, workers=None, out_format=None, quiet=False):
+    """Process files in a pool of workers; raises ValueError when output paths collide."""
+    jobs = list(zip(files, output_paths(files, output_dir, out_format)))
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(16, len(files) // (workers * 4)))
+
+    total_bytes = 0
+    done = 0
+    failed = 0
+    start = time.perf_counter()
+
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(steps,)) as pool:
+        for path, size, elapsed, error in pool.imap_unordered(process_file, jobs, chunksize):
+            done += 1
+            if error:
+                failed += 1
+                print(f"[{done}/{len(files)}] FAILED {path}: {error}", file=sys.stderr)
+                continue
+
+            total_bytes += size
+            if not quiet:
+                mb_s = size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+                print(f"[{done}/{len(files)}] {path}  {elapsed * 1000:.1f} ms  {mb_s:.2f} MB/s")
+
+    elapsed = time.perf_counter() - start
+    ok = done - failed
+    print(f"Processed {ok} image(s), {failed} failed, in {elapsed:.2f} s with {workers} worker(s)")
+    if elapsed > 0:
+        print(f"Throughput: {ok / elapsed:.2f} images/s, "
+              f"{total_bytes / (1024 * 1024) / elapsed:.2f} MB/s")
+
+    return ok, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a recipe of image operations to many files.")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of input images")
+    parser.add_argument('--recipe', required=True, help="JSON or YAML recipe file")
+    parser.add_argument('--output', required=True, help="Output directory")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes (default: all cores)")
+    parser.add_argument('--format', default=None, help="Output extension, e.g. .png (default: keep input format)")
+    parser.add_argument('--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--quiet', action='store_true', help="Only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    try:
+        steps = load_recipe(args.recipe)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid recipe: {e}")
+
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        parser.error("no input images found")
+
+    out_format = args.format
+    if out_format and not out_format.startswith('.'):
+        out_format = '.' + out_format
+
+    try:
+        _, failed = run_batch(files, steps, args.output, args.workers, out_format, args.quiet)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import json
+import os
+
+import numpy as np
+
+from Feature_Ex.cv_pro import (
+    Grayscale_Luminosity, BackAndWhite,
+    adjust_brightness, adjust_contrast, adjust_saturation, adjust_temperature,
+    adjust_highlights, adjust_shadows, adjust_vibrance, adjust_hsv, adjust_color_channel,
+    bgremove1, bgremove_smooth, bgremove_grabcut,
+)
+from Feature_Ex.threshold_engine import adaptive_threshold
+from More_Function.morecv import convert_to_pixel_art, apply_cartoon_effect, apply_sketch_effect
+from More_Function.document_scanner import scan_document
+from Transformation.Image_Tran import translate_image, scale_image, shear_image, rotate_image
+
+# ชื่อ operation ที่ใช้ใน recipe -> ฟังก์ชันที่ใช้งานจริง
+# พารามิเตอร์ใน recipe จะถูกส่งเป็น keyword argument ตามชื่อในฟังก์ชัน
+OPERATIONS = {
+    'grayscale': Grayscale_Luminosity,
+    'black_and_white': BackAndWhite,
+    'brightness': adjust_brightness,
+    'contrast': adjust_contrast,
+    'saturation': adjust_saturation,
+    'temperature': adjust_temperature,
+    'highlights': adjust_highlights,
+    'shadows': adjust_shadows,
+    'vibrance': adjust_vibrance,
+    'hsv': adjust_hsv,
+    'color_channel': adjust_color_channel,
+    'adaptive_threshold': adaptive_threshold,
+    'bgremove': bgremove1,
+    'bgremove_smooth': bgremove_smooth,
+    'bgremove_grabcut': bgremove_grabcut,
+    'scan_document': scan_document,
+    'pixel_art': convert_to_pixel_art,
+    'cartoon': apply_cartoon_effect,
+    'sketch': apply_sketch_effect,
+    'translate': translate_image,
+    'scale': scale_image,
+    'shear': shear_image,
+    'rotate': rotate_image,
+}
+
+def load_recipe(path):
+    """
+    Load a recipe file (JSON or YAML) and return a list of (op_name, params).
+
+    A recipe is either a list of steps or a mapping with an "operations" list.
+    Each step is a mapping with an "op" key plus the function's parameters, e.g.
+
+        {"operations": [{"op": "brightness", "value": 20},
+                        {"op": "pixel_art", "pixel_size": 8, "color_levels": 4}]}
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8') as f:
+        if ext in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML recipes need PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    return parse_recipe(data)
+
+def parse_recipe(data):
+    if isinstance(data, dict):
+        data = data.get('operations', [])
+
+    if not isinstance(data, list):
+        raise ValueError("Recipe must be a list of operations")
+
+    steps = []
+    for i, step in enumerate(data):
+        if isinstance(step, str):
+            step = {'op': step}
+        if not isinstance(step, dict) or 'op' not in step:
+            raise ValueError(f"Step {i + 1}: expected a mapping with an 'op' key")
+
+        params = dict(step)
+        name = params.pop('op')
+        if name not in OPERATIONS:
+            raise ValueError(f"Step {i + 1}: unknown operation '{name}'")
+        steps.append((name, params))
+
+    return steps
+
+def apply_recipe(img, steps):
+    """Run every step of a parsed recipe on img and return the result as uint8."""
+    for name, params in steps:
+        img = OPERATIONS[name](img, **params)
+        if img is None:
+            raise ValueError(f"Operation '{name}' returned no image")
+        if img.dtype != np.uint8:
+            img = np.clip(img, 0, 255).astype(np.uint8)
+    return img
@@ -0,0 +1,380 @@
+"""
+Apply a recipe to every frame of a video or animated GIF.
+
+    python -m Batch.video_process clip.mp4 --recipe recipe.json --output out.mp4
+    python -m Batch.video_process anim.gif --recipe recipe.json --output out.gif --workers 4
+    python -m Batch.video_process clip.mp4 --recipe recipe.json --preview
+
+Decoding, processing and encoding run as separate stages connected by
+bounded queues: one decode thread, a pool of worker threads running the
+recipe (OpenCV and NumPy release the GIL) and one encode thread that writes
+frames back in order. In preview mode frames are shown in real time and
+frames the workers cannot keep up with are dropped.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from Batch.recipe import load_recipe, apply_recipe
+from Feature_Ex.channels import to_bgr, to_pil_image
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm', '.gif')
+
+FOURCC = {
+    '.mp4': 'mp4v', '.m4v': 'mp4v', '.mov': 'mp4v',
+    '.avi': 'MJPG', '.mkv': 'XVID',
+}
+
+DEFAULT_FPS = 25.0
+# ms ต่อเฟรมของ GIF ที่ไม่ได้ระบุ duration
+GIF_DEFAULT_DURATION = 100
+
+_DONE = object()
+
+def open_frames(path):
+    """
+    Return (frames, fps) where frames yields (frame_bgr, duration_ms).
+
+    Animated GIFs are read with PIL because cv2.imread only returns the first
+    frame; every frame keeps its own duration. Their fps comes from the
+    first frame's duration so the frames are decoded only once.
+    """
+    if path.lower().endswith('.gif'):
+        from PIL import Image, ImageSequence
+
+        img = Image.open(path)
+        fps = 1000.0 / (img.info.get('duration') or GIF_DEFAULT_DURATION)
+
+        def gif_frames():
+            with img:
+                for frame in ImageSequence.Iterator(img):
+                    duration = frame.info.get('duration') or GIF_DEFAULT_DURATION
+                    rgb = np.asarray(frame.convert('RGB'))
+                    yield cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), duration
+
+        return gif_frames(), fps
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"unable to open video {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    duration = 1000.0 / fps
+
+    def video_frames():
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield frame, duration
+        finally:
+            capture.release()
+
+    return video_frames(), fps
+
+class GifWriter:
+    """
+    Write frames to an animated GIF as they arrive.
+
+    Every frame is quantized to its own 256-colour palette (a local colour
+    table) and appended to the file straight away, so memory use does not
+    grow with the number of frames. close() writes the GIF trailer.
+    """
+
+    def __init__(self, path, loop=0):
+        self.path = path
+        self.loop = loop
+        self.file = None
+        self.size = None
+
+    def write(self, frame, duration):
+        from PIL import Image, GifImagePlugin
+
+        img = to_pil_image(to_bgr(frame))
+        if self.file is None:
+            self.size = img.size
+        elif img.size != self.size:
+            img = img.resize(self.size, Image.LANCZOS)
+        img = img.convert('P', palette=Image.Palette.ADAPTIVE)
+
+        if self.file is None:
+            # header ใช้ขนาดและ palette ของเฟรมแรก และใส่ loop (NETSCAPE2.0) ไว้ครั้งเดียว
+            header, _ = GifImagePlugin.getheader(img, info={'loop': self.loop})
+            self.file = open(self.path, 'wb')
+            self.file.writelines(header)
+        self.file.writelines(GifImagePlugin.getdata(img, duration=int(round(duration)),
+                                                    include_color_table=True))
+
+    def close(self):
+        if self.file is None:
+            raise ValueError("no frames to write")
+        self.file.write(b';')
+        self.file.close()
+
+class VideoWriter:
+    """cv2.VideoWriter opened with the size of the first frame it receives."""
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+        self.size = None
+
+    def write(self, frame, duration):
+        # operation อย่าง scale อาจเปลี่ยนขนาดภาพ หรือคืนภาพเทามา แต่ไฟล์วิดีโอต้องเป็น BGR ขนาดเดียว
+        frame = to_bgr(frame)
+        if self.writer is None:
+            ext = os.path.splitext(self.path)[1].lower()
+            codec = FOURCC.get(ext, 'mp4v')
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            self.size = (frame.shape[1], frame.shape[0])
+            if codec == 'MJPG':
+                # Motion-JPEG ใน .avi มี encoder ของ OpenCV เองในตัว ไม่ต้องพึ่ง FFmpeg
+                self.writer = cv2.VideoWriter(self.path, cv2.CAP_OPENCV_MJPEG, fourcc, self.fps, self.size)
+            else:
+                self.writer = cv2.VideoWriter(self.path, fourcc, self.fps, self.size)
+            if not self.writer.isOpened():
+                raise ValueError(f"unable to open {self.path} for writing")
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+def open_writer(path, fps):
+    if path.lower().endswith('.gif'):
+        return GifWriter(path)
+    return VideoWriter(path, fps)
+
+def run_pipeline(frames, steps, sink, workers=None, queue_size=None, realtime_fps=None, on_progress=None):
+    """
+    Decode -> process -> encode with bounded queues between the stages.
+
+    frames yields (frame, duration_ms); sink(index, frame, duration_ms) is
+    called from the encode thread in frame order. With realtime_fps set,
+    decoding is paced to that rate and a frame is dropped when the workers
+    are still busy with earlier ones, so the output keeps up with real time.
+    on_progress(stats) is called after every written frame.
+
+    Returns a dict with frames, dropped, seconds and fps.
+    """
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or workers * 2
+    in_queue = queue.Queue(queue_size)
+    out_queue = queue.Queue(queue_size)
+    stop = threading.Event()
+    errors = []
+    stats = {'frames': 0, 'dropped': 0, 'seconds': 0.0, 'fps': 0.0}
+    start = time.perf_counter()
+
+    def put(q, item):
+        # ใช้ timeout เพื่อให้หยุดได้ถ้ามี stage อื่นล้ม
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return _DONE
+
+    def decode():
+        # เลขลำดับนับเฉพาะเฟรมที่ส่งเข้า queue จริง เฟรมที่ถูก drop จึงไม่ทำให้ลำดับขาด
+        sequence = 0
+        try:
+            for index, (frame, duration) in enumerate(frames):
+                if stop.is_set():
+                    break
+                if realtime_fps:
+                    delay = start + index / realtime_fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    try:
+                        in_queue.put_nowait((sequence, frame, duration))
+                    except queue.Full:
+                        stats['dropped'] += 1
+                        continue
+                elif not put(in_queue, (sequence, frame, duration)):
+                    break
+                sequence += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(workers):
+                put(in_queue, _DONE)
+
+    def process():
+        try:
+            while True:
+                item = get(in_queue)
+                if item is _DONE:
+                    break
+                index, frame, duration = item
+                if not put(out_queue, (index, apply_recipe(frame, steps), duration)):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(out_queue, _DONE)
+
+    def encode():
+        # worker เสร็จไม่ตามลำดับ เก็บไว้ใน buffer จนกว่าจะถึงลำดับของเฟรมนั้น
+        pending = {}
+        next_index = 0
+        finished = 0
+        try:
+            while finished < workers:
+                item = get(out_queue)
+                if item is _DONE:
+                    finished += 1
+                    continue
+                pending[item[0]] = item
+                while next_index in pending:
+                    index, frame, duration = pending.pop(next_index)
+                    sink(index, frame, duration)
+                    next_index += 1
+                    stats['frames'] += 1
+                    if on_progress:
+                        on_progress(stats)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=process, daemon=True) for _ in range(workers)]
+    threads.append(threading.Thread(target=encode, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['fps'] = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    if errors:
+        raise errors[0]
+    return stats
+
+def process_video(input_path, output_path, steps, workers=None, queue_size=None, on_progress=None):
+    """Apply a parsed recipe to every frame of input_path and write output_path."""
+    frames, fps = open_frames(input_path)
+    writer = open_writer(output_path, fps)
+    try:
+        stats = run_pipeline(frames, steps, lambda index, frame, duration: writer.write(frame, duration),
+                             workers, queue_size, on_progress=on_progress)
+    finally:
+        writer.close()
+    return stats
+
+def preview_video(input_path, steps, workers=None, window_name="Preview"):
+    """
+    Play the processed video in real time with cv2.imshow, dropping frames when behind. Esc stops.
+
+    The pipeline runs on a background thread; HighGUI must be used from the
+    calling (main) thread, so the encode stage only queues frames for it.
+    """
+    frames, fps = open_frames(input_path)
+    stopped = threading.Event()
+    shown = queue.Queue(2)
+    outcome = {}
+
+    def frames_until_stopped():
+        for item in frames:
+            if stopped.is_set():
+                break
+            yield item
+
+    def to_display(index, frame, duration):
+        while not stopped.is_set():
+            try:
+                shown.put(frame, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run():
+        try:
+            outcome['stats'] = run_pipeline(frames_until_stopped(), steps, to_display, workers, realtime_fps=fps)
+        except Exception as e:
+            outcome['error'] = e
+
+    pipeline = threading.Thread(target=run, daemon=True)
+    pipeline.start()
+    try:
+        while pipeline.is_alive() or not shown.empty():
+            try:
+                frame = shown.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if stopped.is_set():
+                continue
+            cv2.imshow(window_name, frame)
+            if cv2.waitKey(1) == 27:
+                stopped.set()
+        pipeline.join()
+    finally:
+        stopped.set()
+        cv2.destroyAllWindows()
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['stats']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a recipe of image operations to every frame of a video or GIF.")
+    parser.add_argument('input', help="Video file or animated GIF")
+    parser.add_argument('--recipe', required=True, help="JSON or YAML recipe file")
+    parser.add_argument('--output', help="Output video or .gif (required unless --preview)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processing threads (default: all cores)")
+    parser.add_argument('--queue-size', type=int, default=None, help="Frames buffered between stages (default: 2 x workers)")
+    parser.add_argument('--preview', action='store_true', help="Play in real time instead of writing a file")
+    parser.add_argument('--quiet', action='store_true', help="Only print the summary")
+    args = parser.parse_args(argv)
+
+    if not args.preview and not args.output:
+        parser.error("--output is required unless --preview is given")
+
+    try:
+        steps = load_recipe(args.recipe)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid recipe: {e}")
+
+    def progress(stats):
+        if not args.quiet and stats['frames'] % 25 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{stats['frames']} frames  {stats['frames'] / elapsed:.1f} fps", end='\r')
+
+    started = time.perf_counter()
+    try:
+        if args.preview:
+            stats = preview_video(args.input, steps, args.workers)
+        else:
+            stats = process_video(args.input, args.output, steps, args.workers, args.queue_size, progress)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if not args.quiet and not args.preview:
+        print()
+    print(f"Processed {stats['frames']} frame(s) in {stats['seconds']:.2f} s: "
+          f"{stats['fps']:.1f} fps, {stats['dropped']} dropped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Headless benchmark suite for the image operations.
+
+    python -m Benchmark.benchmark run --sizes 1,4,12 --output results.json
+    python -m Benchmark.benchmark run --sizes 100 --modes bgr --filter adjust_
+    python -m Benchmark.benchmark compare baseline.json results.json --threshold 0.10
+
+peak_rss_mb is how much the peak resident set grew during one call, so
+buffers allocated inside OpenCV count too. It is measured in a child
+process and is null where getrusage is unavailable (Windows).
+"""
+import argparse
+import datetime
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ไม่ต้องใช้หน้าจอ (ไม่มี Tk / matplotlib backend แบบ GUI)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import cv2
+import numpy as np
+
+from Feature_Ex import cv_pro, threshold_engine
+from More_Function import morecv, document_scanner
+from Transformation import Image_Tran
+
+MODES = {'gray': 1, 'bgr': 3, 'bgra': 4}
+
+# ru_maxrss เป็น KB บน Linux แต่เป็น byte บน macOS
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# (ชื่อ, ฟังก์ชัน, kwargs, ขนาดสูงสุดเป็น MP หรือ None)
+CASES = [
+    ('cv_pro.Grayscale_Luminosity', cv_pro.Grayscale_Luminosity, {}, None),
+    ('cv_pro.BackAndWhite', cv_pro.BackAndWhite, {}, None),
+    ('cv_pro.adjust_brightness', cv_pro.adjust_brightness, {'value': 30}, None),
+    ('cv_pro.adjust_contrast', cv_pro.adjust_contrast, {'value': 30}, None),
+    ('cv_pro.adjust_saturation', cv_pro.adjust_saturation, {'value': 30}, None),
+    ('cv_pro.adjust_temperature', cv_pro.adjust_temperature, {'value': 30}, None),
+    ('cv_pro.adjust_highlights', cv_pro.adjust_highlights, {'value': 30}, None),
+    ('cv_pro.adjust_shadows', cv_pro.adjust_shadows, {'value': 30}, None),
+    ('cv_pro.adjust_vibrance', cv_pro.adjust_vibrance, {'value': 30}, None),
+    ('cv_pro.adjust_hsv', cv_pro.adjust_hsv,
+     {'brightness': 20, 'highlights': 30, 'shadows': -20, 'saturation': 40, 'vibrance': 25}, None),
+    ('cv_pro.adjust_color_channel', cv_pro.adjust_color_channel, {'color': 'R', 'value': 30}, None),
+    ('threshold_engine.adaptive_threshold[mean]', threshold_engine.adaptive_threshold,
+     {'method': 'Mean', 'block_size': 31, 'c': 2}, None),
+    ('threshold_engine.adaptive_threshold[sauvola]', threshold_engine.adaptive_threshold,
+     {'method': 'Sauvola', 'block_size': 31, 'c': 2}, None),
+    ('cv_pro.bgremove1', cv_pro.bgremove1, {}, None),
+    ('cv_pro.bgremove_smooth', cv_pro.bgremove_smooth, {'blur_amount': 7, 'threshold_offset': 10}, None),
+    ('cv_pro.bgremove_grabcut', cv_pro.bgremove_grabcut, {'iterations': 1}, 1),
+    ('cv_pro.bgremove_grabcut[balanced]', cv_pro.bgremove_grabcut,
+     {'iterations': 1, 'quality': 'balanced'}, 24),
+    ('morecv.convert_to_pixel_art', morecv.convert_to_pixel_art, {'pixel_size': 8, 'color_levels': 4}, None),
+    ('morecv.convert_to_pixel_art[kmeans]', morecv.convert_to_pixel_art,
+     {'pixel_size': 8, 'color_levels': 16, 'mode': 'kmeans'}, None),
+    ('morecv.apply_cartoon_effect', morecv.apply_cartoon_effect, {}, 24),
+    ('morecv.apply_cartoon_effect[balanced]', morecv.apply_cartoon_effect, {'quality': 'balanced'}, None),
+    ('morecv.apply_cartoon_effect[fast]', morecv.apply_cartoon_effect, {'quality': 'fast'}, None),
+    ('morecv.apply_sketch_effect', morecv.apply_sketch_effect, {}, None),
+    ('document_scanner.scan_document', document_scanner.scan_document, {}, None),
+    ('Image_Tran.translate_image', Image_Tran.translate_image, {'tx': 40, 'ty': -25}, None),
+    ('Image_Tran.scale_image', Image_Tran.scale_image, {'sx': 0.8, 'sy': 1.2}, None),
+    ('Image_Tran.shear_image', Image_Tran.shear_image, {'shx': 0.2, 'shy': 0.1}, None),
+    ('Image_Tran.rotate_image', Image_Tran.rotate_image, {'angle': 30}, None),
+    ('Image_Tran.transform_image', Image_Tran.transform_image,
+     {'tx': 40, 'ty': -25, 'sx': 0.8, 'sy': 1.2, 'shx': 0.2, 'shy': 0.1, 'angle': 30}, None),
+]
+
+def make_image(megapixels, mode, seed=0):
+    """Deterministic synthetic photo: gradient background, noise and a bright 'document' quad."""
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    rng = np.random.default_rng(seed)
+
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), np.uint8)
+    img[..., 0] = (0.6 * x + 0.2 * y).astype(np.uint8)
+    img[..., 1] = (0.3 * x + 0.5 * y).astype(np.uint8)
+    img[..., 2] = (0.8 * y + 20).clip(0, 255).astype(np.uint8)
+
+    quad = np.array([[0.22, 0.18], [0.78, 0.22], [0.74, 0.84], [0.2, 0.8]]) * [width, height]
+    cv2.fillConvexPoly(img, quad.astype(np.int32), (235, 235, 230))
+    noise = rng.integers(-12, 13, size=(height, width, 1), dtype=np.int16)
+    img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    if mode == 'gray':
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if mode == 'bgra':
+        return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    return img
+
+def time_case(func, img, kwargs, warmup, repeat, rss_context=None):
+    for _ in range(warmup):
+        func(img, **kwargs)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(img, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    return times, peak_rss(rss_context, func, img, kwargs)
+
+def _peak_rss_child(func, img, kwargs, conn):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(img, **kwargs)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((after - before) * MAXRSS_UNIT)
+    conn.close()
+
+def make_rss_context():
+    """
+    multiprocessing context for peak_rss, or None where peak RSS cannot be measured.
+
+    Children are forked from a fork server that has only imported the
+    operations, not from this process: memory freed by earlier cases would
+    otherwise be reused by the call without raising its peak.
+    """
+    if resource is None or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    ctx = multiprocessing.get_context('forkserver')
+    ctx.set_forkserver_preload(sorted({func.__module__ for _, func, _, _ in CASES}))
+    return ctx
+
+def peak_rss(ctx, func, img, kwargs):
+    """Bytes by which the peak RSS of a child process grew during one call (None without ctx)."""
+    if ctx is None:
+        return None
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_peak_rss_child, args=(func, img, kwargs, sender))
+    process.start()
+    sender.close()
+    try:
+        peak = receiver.recv()
+    except EOFError:
+        # child ล้มก่อนส่งผล
+        peak = None
+    process.join()
+    return peak
+
+def run(sizes, modes, name_filter, warmup, repeat, quiet=False):
+    rss_context = make_rss_context()
+    results = []
+    for megapixels in sizes:
+        for mode in modes:
+            img = make_image(megapixels, mode)
+            for name, func, kwargs, max_mp in CASES:
+                if name_filter and not any(fnmatch.fnmatch(name, f'*{f}*') for f in name_filter):
+                    continue
+                entry = {'op': name, 'megapixels': megapixels, 'mode': mode,
+                         'shape': list(img.shape), 'params': kwargs}
+                if max_mp is not None and megapixels > max_mp:
+                    entry['status'] = 'skipped'
+                    results.append(entry)
+                    continue
+                try:
+                    times, peak = time_case(func, img, kwargs, warmup, repeat, rss_context)
+                except Exception as e:
+                    entry['status'] = 'unsupported'
+                    entry['error'] = f'{type(e).__name__}: {e}'
+                else:
+                    entry.update({
+                        'status': 'ok',
+                        'median_s': statistics.median(times),
+                        'min_s': min(times),
+                        'mean_s': statistics.fmean(times),
+                        'peak_rss_mb': None if peak is None else peak / (1024 * 1024),
+                        'mpix_per_s': megapixels / statistics.median(times),
+                    })
+                results.append(entry)
+
+                if not quiet:
+                    if entry['status'] == 'ok':
+                        memory = 'n/a' if peak is None else f"{entry['peak_rss_mb']:.1f}"
+                        print(f"{name:36s} {megapixels:>5}MP {mode:4s} "
+                              f"{entry['median_s'] * 1000:9.2f} ms  {memory:>8s} MB")
+                    else:
+                        print(f"{name:36s} {megapixels:>5}MP {mode:4s} {entry['status']}")
+    return results
+
+def environment():
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+
+def _result_key(entry):
+    return (entry['op'], entry['megapixels'], entry['mode'])
+
+def compare(baseline, current, threshold):
+    """Return a list of (entry, ratio) where current is slower than baseline by more than threshold."""
+    base = {_result_key(e): e for e in baseline['results'] if e.get('status') == 'ok'}
+    regressions = []
+    for entry in current['results']:
+        old = base.get(_result_key(entry))
+        if entry.get('status') != 'ok' or old is None:
+            continue
+        ratio = entry['median_s'] / old['median_s']
+        if ratio > 1.0 + threshold:
+            regressions.append((entry, ratio))
+    return regressions
+
+def _parse_sizes(text):
+    return [float(s) if '.' in s else int(s) for s in text.split(',') if s]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every image operation on synthetic images.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help="Run the benchmarks")
+    run_parser.add_argument('--sizes', type=_parse_sizes, default=[1, 4, 12],
+                            help="Comma separated sizes in megapixels (default: 1,4,12)")
+    run_parser.add_argument('--modes', default='gray,bgr,bgra', help="Comma separated: gray,bgr,bgra")
+    run_parser.add_argument('--filter', action='append', default=[], help="Only ops whose name contains this")
+    run_parser.add_argument('--warmup', type=int, default=1)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--quiet', action='store_true')
+
+    cmp_parser = sub.add_parser('compare', help="Flag regressions against a baseline")
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=0.10,
+                            help="Allowed slowdown of the median time (default: 0.10 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        modes = [m for m in args.modes.split(',') if m]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+
+        cv2.setRNGSeed(0)
+        results = run(args.sizes, modes, args.filter, args.warmup, args.repeat, args.quiet)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"Saved {len(results)} result(s) to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    for entry, ratio in regressions:
+        print(f"REGRESSION {entry['op']} {entry['megapixels']}MP {entry['mode']}: "
+              f"{(ratio - 1) * 100:.1f}% slower")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
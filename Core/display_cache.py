@@ -0,0 +1,49 @@
+import cv2
+
+from Feature_Ex.channels import to_uint8, to_pil_image
+
+class DisplayPyramid:
+    """
+    Multi-resolution copies of one image for drawing it on a canvas.
+
+    Levels are halved with cv2.pyrDown, built lazily and kept until the image
+    changes. A redraw resizes from the smallest level that is still at least
+    as large as the target, so its cost depends on the canvas size instead of
+    the image size. The last rendered PIL image is cached per target size.
+    """
+
+    def __init__(self, img):
+        self.source = img
+        self.levels = [to_uint8(img)]
+        self._last = None  # ((width, height), PIL image)
+
+    def fit_size(self, max_width, max_height):
+        """Size of the image scaled to fit (never enlarged), like PIL's thumbnail()."""
+        height, width = self.source.shape[:2]
+        scale = min(max_width / width, max_height / height, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def level_for(self, width, height):
+        """Return the smallest level that still covers width x height."""
+        level = self.levels[-1]
+        while level.shape[1] // 2 >= width and level.shape[0] // 2 >= height:
+            level = cv2.pyrDown(level)
+            self.levels.append(level)
+
+        for level in reversed(self.levels):
+            if level.shape[1] >= width and level.shape[0] >= height:
+                return level
+        return self.levels[0]
+
+    def render(self, max_width, max_height):
+        """PIL image of the source fitted into max_width x max_height."""
+        size = self.fit_size(max_width, max_height)
+        if self._last is not None and self._last[0] == size:
+            return self._last[1]
+
+        level = self.level_for(*size)
+        if (level.shape[1], level.shape[0]) != size:
+            level = cv2.resize(level, size, interpolation=cv2.INTER_AREA)
+        img_pil = to_pil_image(level)
+        self._last = (size, img_pil)
+        return img_pil
@@ -0,0 +1,232 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from Core.display_cache import DisplayPyramid
+from Core.edit_graph import EditGraph, Snapshot
+from Core.history import EditHistory
+
+def freeze(img):
+    """Mark img read-only (in place) and return it."""
+    if img is not None and img.flags.writeable:
+        img.flags.writeable = False
+    return img
+
+def _base(img):
+    while isinstance(img.base, np.ndarray):
+        img = img.base
+    return img
+
+def _unique_bytes(arrays):
+    """Bytes held by arrays, counting arrays that share one buffer only once."""
+    seen = {}
+    for arr in arrays:
+        if arr is None or isinstance(arr, np.memmap):
+            continue
+        base = _base(arr)
+        seen[id(base)] = base.nbytes
+    return sum(seen.values())
+
+def format_bytes(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+class ImageDocument:
+    """
+    The image being edited: its edit steps, pixels, undo history and display pyramid.
+
+    The session is an EditGraph over the original: every commit() appends a
+    step, and steps can be switched off, moved or removed afterwards. Only
+    the steps after the change are recomputed, because the output of every
+    step is cached. A step is (label, op, params), where op(img, **params)
+    can be replayed on a different input. A commit without a step keeps its
+    result as a fixed Snapshot. Undo and redo bring back both the pixels and
+    the list of steps.
+
+    Every image the document holds is read-only, so original and current
+    are handed to windows as they are, without a copy; operations return a
+    new array instead of writing into their input. commit() takes ownership
+    of the array an operation returned (it is frozen, not copied), so one
+    edit costs one new buffer.
+
+    Bytes are counted per buffer (a buffer shared by original, current, the
+    step cache and the display pyramid is counted once). When the total goes
+    over max_bytes the original is moved to a memory-mapped temp file.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, history_bytes=256 * 1024 * 1024,
+                 graph_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.history = EditHistory(max_bytes=history_bytes)
+        self.graph = EditGraph(cache_bytes=graph_bytes)
+        self.path = None
+        self.current = None
+        self._original = None
+        self._pyramid = None
+        self._spill_dir = None
+
+    @property
+    def original(self):
+        """The image as loaded (read-only; may be memory-mapped from disk)."""
+        return self._original
+
+    @property
+    def loaded(self):
+        return self.current is not None
+
+    @property
+    def steps(self):
+        """The edit steps (EditNode) in order."""
+        return self.graph.nodes
+
+    def load(self, path, img):
+        """Start editing img, read from path."""
+        self.clear()
+        self.path = path
+        self._original = freeze(img)
+        self.current = self._original
+        self.graph.set_source(self._original)
+        self.history.reset(self.current, self.graph.chain())
+        self._enforce_budget()
+
+    def clear(self):
+        self.history.clear()
+        self.graph.set_chain([])
+        self.graph.cache.clear()
+        self.path = None
+        self.current = None
+        self._original = None
+        self._pyramid = None
+        self._remove_spill()
+
+    def commit(self, img, step=None):
+        """
+        Make img (taken over without copying) the current image and record it for undo.
+
+        step is (label, op, params) describing how img was made from the
+        current image; img becomes that step's cached output.
+        """
+        img = freeze(img)
+        if step is None:
+            label, op, params = "Edit", Snapshot(img), {}
+        else:
+            label, op, params = step
+        node_id = self.graph.add(op, params, label=label)
+        self.graph.prime(node_id, img)
+        self._set_current(img)
+        self.history.push(self.current, self.graph.chain())
+        self._enforce_budget()
+
+    def set_step_enabled(self, node_id, enabled):
+        """Switch a step on or off and recompute the image."""
+        self._edit_steps(lambda: self.graph.set_enabled(node_id, enabled))
+
+    def move_step(self, node_id, position):
+        """Move a step to position (0 = first) and recompute the image."""
+        self._edit_steps(lambda: self.graph.move(node_id, position))
+
+    def remove_step(self, node_id):
+        self._edit_steps(lambda: self.graph.remove(node_id))
+
+    def reset(self):
+        """Go back to the original image by dropping every step (as a new undo step)."""
+        if self._original is None or not self.graph.nodes:
+            return
+        self._edit_steps(lambda: self.graph.set_chain([]))
+
+    def _edit_steps(self, change):
+        # ถ้าคำนวณใหม่ไม่ได้ (เช่นขั้นที่ต้องหาเอกสารไม่เจอแล้ว) ให้กลับไปใช้ขั้นตอนเดิม
+        previous = self.graph.chain()
+        change()
+        try:
+            img = self.graph.output()
+        except Exception:
+            self.graph.set_chain(previous)
+            raise
+        if isinstance(img, np.memmap):
+            img = np.array(img)
+        self._set_current(img)
+        self.history.push(self.current, self.graph.chain())
+        self._enforce_budget()
+
+    def undo(self):
+        previous = self.history.undo()
+        if previous is None:
+            return False
+        self.graph.set_chain(self.history.state)
+        self._set_current(previous)
+        return True
+
+    def redo(self):
+        following = self.history.redo()
+        if following is None:
+            return False
+        self.graph.set_chain(self.history.state)
+        self._set_current(following)
+        return True
+
+    def _set_current(self, img):
+        self.current = freeze(img)
+        # pyramid ของภาพเดิมไม่ใช้แล้ว ไม่ต้องเก็บไว้ให้กินหน่วยความจำ
+        self._pyramid = None
+
+    def render(self, max_width, max_height):
+        """PIL image of the current image fitted into max_width x max_height."""
+        if self._pyramid is None or self._pyramid.source is not self.current:
+            self._pyramid = DisplayPyramid(self.current)
+        return self._pyramid.render(max_width, max_height)
+
+    def memory_usage(self):
+        """Bytes held in RAM per buffer, plus history on disk and the total."""
+        levels = self._pyramid.levels if self._pyramid is not None else []
+        cached = self.graph.cache.values()
+        snapshots = [node.op.img for node in self.graph.nodes if isinstance(node.op, Snapshot)]
+        current = _unique_bytes([self.current])
+        usage = {
+            'current': current,
+            'original': _unique_bytes([self.current, self._original]) - current,
+            'steps': _unique_bytes([self.current, self._original] + cached + snapshots)
+                     - _unique_bytes([self.current, self._original]),
+            'display': _unique_bytes([self.current] + levels) - current,
+            'history': self.history.memory_bytes(),
+            'history_disk': self.history.disk_bytes(),
+        }
+        usage['total'] = (usage['current'] + usage['original'] + usage['steps'] + usage['display']
+                          + usage['history'])
+        return usage
+
+    def memory_text(self):
+        """One line for the status bar."""
+        usage = self.memory_usage()
+        text = (f"Memory {format_bytes(usage['total'])} / {format_bytes(self.max_bytes)}: "
+                f"image {format_bytes(usage['current'])}")
+        if usage['original']:
+            text += f", original {format_bytes(usage['original'])}"
+        if usage['steps']:
+            text += f", steps {format_bytes(usage['steps'])}"
+        text += f", display {format_bytes(usage['display'])}, history {format_bytes(usage['history'])}"
+        if usage['history_disk']:
+            text += f" (+{format_bytes(usage['history_disk'])} on disk)"
+        return text
+
+    def _enforce_budget(self):
+        usage = self.memory_usage()
+        if usage['total'] <= self.max_bytes or not usage['original']:
+            return
+        # ต้นฉบับใช้เฉพาะตอนคำนวณขั้นตอนใหม่ตั้งแต่ต้น ย้ายไปไว้บนดิสก์ได้ (อ่านผ่าน memmap เมื่อต้องใช้)
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='photo_editor_document_')
+        path = os.path.join(self._spill_dir, 'original.npy')
+        np.save(path, self._original)
+        self._original = np.load(path, mmap_mode='r')
+        self.graph.replace_source(self._original)
+
+    def _remove_spill(self):
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def close(self):
+        self.clear()
+        self.history.close()
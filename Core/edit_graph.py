@@ -0,0 +1,207 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+def _freeze(value):
+    """Turn parameters into something hashable so they can be part of a cache key."""
+    if isinstance(value, np.ndarray):
+        return ('ndarray', value.shape, value.dtype.str, value.tobytes())
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class ByteLRUCache:
+    """LRU cache of numpy arrays limited by the total number of bytes held."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = value.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = value
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def values(self):
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+class EditNode:
+    def __init__(self, node_id, op, params, enabled=True, label=None, input_id=None):
+        self.id = node_id
+        self.op = op
+        self.params = dict(params or {})
+        self.enabled = enabled
+        self.label = label or self.op_name
+        self.input_id = input_id  # None = ภาพต้นฉบับ
+
+    @property
+    def op_name(self):
+        return self.op if isinstance(self.op, str) else getattr(self.op, '__name__', repr(self.op))
+
+class Snapshot:
+    """Operation for an edit that cannot be replayed: ignores its input and returns a fixed image."""
+
+    __name__ = 'snapshot'
+
+    def __init__(self, img):
+        self.img = img
+
+    def __call__(self, img):
+        return self.img
+
+class EditGraph:
+    """
+    Non-destructive edit session: a graph of operations over one source image.
+
+    Each node applies one operation to the output of its input node (or to the
+    source). A node's output is cached under a key derived from its operation,
+    its parameters and its whole upstream chain, so after a parameter change
+    only the nodes downstream of it miss the cache. A disabled node passes its
+    input through and shares its input's key, so toggling a step is cheap, and
+    reordering keeps the cached results of the unchanged prefix.
+
+    Operations are names from Batch.recipe.OPERATIONS or callables taking
+    (img, **params).
+    """
+
+    def __init__(self, source=None, cache_bytes=512 * 1024 * 1024):
+        self.cache = ByteLRUCache(cache_bytes)
+        self._nodes = OrderedDict()
+        self._ids = itertools.count(1)
+        self._source = None
+        self._source_version = 0
+        if source is not None:
+            self.set_source(source)
+
+    def set_source(self, img):
+        self._source = img
+        self._source_version += 1
+
+    def replace_source(self, img):
+        """Swap in an identical copy of the source (e.g. memory-mapped) without invalidating the cache."""
+        self._source = img
+
+    @property
+    def nodes(self):
+        return list(self._nodes.values())
+
+    def add(self, op, params=None, enabled=True, label=None, input_id='last'):
+        """Add a node and return its id. By default it is chained after the last node."""
+        if input_id == 'last':
+            input_id = next(reversed(self._nodes)) if self._nodes else None
+        node = EditNode(next(self._ids), op, params, enabled, label, input_id)
+        self._nodes[node.id] = node
+        return node.id
+
+    def set_enabled(self, node_id, enabled):
+        self._nodes[node_id].enabled = enabled
+
+    def remove(self, node_id):
+        node = self._nodes.pop(node_id)
+        # node ที่ต่อจาก node นี้ให้ไปต่อกับ input ของมันแทน
+        for other in self._nodes.values():
+            if other.input_id == node_id:
+                other.input_id = node.input_id
+
+    def move(self, node_id, position):
+        """Move a node of a linear chain to a new position and relink the chain."""
+        order = [n for n in self._nodes if n != node_id]
+        order.insert(position, node_id)
+        self._nodes = OrderedDict((n, self._nodes[n]) for n in order)
+        previous = None
+        for node in self._nodes.values():
+            node.input_id = previous
+            previous = node.id
+
+    def set_chain(self, specs):
+        """
+        Replace all nodes with a linear chain; cached outputs are kept.
+
+        Each spec is (op, params) or (op, params, enabled, label), as returned by chain().
+        """
+        self._nodes = OrderedDict()
+        for spec in specs:
+            self.add(*spec)
+
+    def chain(self):
+        """The nodes of a linear chain as (op, params, enabled, label) specs for set_chain()."""
+        return tuple((node.op, dict(node.params), node.enabled, node.label)
+                     for node in self._nodes.values())
+
+    def key(self, node_id):
+        if node_id is None:
+            return ('source', self._source_version)
+        node = self._nodes[node_id]
+        input_key = self.key(node.input_id)
+        if not node.enabled:
+            return input_key
+        return (input_key, node.op_name, id(node.op) if callable(node.op) else None, _freeze(node.params))
+
+    def output(self, node_id='last'):
+        """Return the output of a node (default: the last one), computing only uncached nodes."""
+        if node_id == 'last':
+            node_id = next(reversed(self._nodes)) if self._nodes else None
+        if node_id is None:
+            return self._source
+
+        node = self._nodes[node_id]
+        if not node.enabled:
+            return self.output(node.input_id)
+
+        key = self.key(node_id)
+        result = self.cache.get(key)
+        if result is None:
+            img = self.output(node.input_id)
+            result = self._run(node, img)
+            self.cache.put(key, result)
+        return result
+
+    def prime(self, node_id, img):
+        """Cache an output already computed for node_id (e.g. the result an edit window produced)."""
+        img.flags.writeable = False
+        self.cache.put(self.key(node_id), img)
+
+    def _run(self, node, img):
+        op = node.op
+        if isinstance(op, str):
+            from Batch.recipe import OPERATIONS
+            op = OPERATIONS[op]
+        result = op(img, **node.params)
+        if result is None:
+            raise ValueError(f"{node.label} returned no image")
+        if result.dtype != np.uint8:
+            result = np.clip(result, 0, 255).astype(np.uint8)
+        # ผลลัพธ์ใน cache ใช้ร่วมกัน ห้ามแก้ไขทับ
+        result.flags.writeable = False
+        return result
@@ -0,0 +1,221 @@
+import os
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+
+TILE_SIZE = 256
+
+def _as_bytes(img):
+    """View an image of any dtype as a uint8 array with the same height/width."""
+    img = np.ascontiguousarray(img)
+    return img.view(np.uint8).reshape(img.shape[0], img.shape[1], -1)
+
+class _Delta:
+    """
+    The difference between two consecutive images.
+
+    When shape and dtype are unchanged, only tiles that differ are stored, as
+    the zlib-compressed XOR of before and after. XOR is its own inverse, so the
+    same payload turns `after` back into `before` (undo) and `before` into
+    `after` (redo). Otherwise both images are stored compressed.
+    """
+
+    def __init__(self, before, after, tile_size, states=(None, None)):
+        self.path = None
+        self.offsets = None
+        self.states = states  # สถานะที่บันทึกคู่กับภาพ (ก่อน, หลัง) เช่นขั้นตอนใน EditGraph
+
+        if before.shape == after.shape and before.dtype == after.dtype:
+            self.kind = 'tiles'
+            self.regions = []
+            blobs = []
+            a, b = _as_bytes(before), _as_bytes(after)
+            height, width = a.shape[:2]
+            for y in range(0, height, tile_size):
+                for x in range(0, width, tile_size):
+                    region = (slice(y, min(y + tile_size, height)), slice(x, min(x + tile_size, width)))
+                    tile_a, tile_b = a[region], b[region]
+                    if not np.array_equal(tile_a, tile_b):
+                        self.regions.append(region)
+                        blobs.append(zlib.compress(np.bitwise_xor(tile_a, tile_b).tobytes(), 1))
+        else:
+            self.kind = 'full'
+            self.regions = None
+            self.meta = [(before.shape, before.dtype), (after.shape, after.dtype)]
+            blobs = [zlib.compress(np.ascontiguousarray(before).tobytes(), 1),
+                     zlib.compress(np.ascontiguousarray(after).tobytes(), 1)]
+
+        self.blobs = blobs
+        self.nbytes = sum(len(blob) for blob in blobs)
+
+    @property
+    def empty(self):
+        return self.kind == 'tiles' and not self.regions
+
+    def spill(self, path):
+        """Move the payload to a file so it no longer counts against the RAM budget."""
+        offsets = []
+        with open(path, 'wb') as f:
+            for blob in self.blobs:
+                offsets.append((f.tell(), len(blob)))
+                f.write(blob)
+        self.path = path
+        self.offsets = offsets
+        self.blobs = None
+
+    def _load_blobs(self):
+        if self.blobs is not None:
+            return self.blobs
+        blobs = []
+        with open(self.path, 'rb') as f:
+            for offset, length in self.offsets:
+                f.seek(offset)
+                blobs.append(f.read(length))
+        return blobs
+
+    def discard(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def apply(self, img, backward):
+        blobs = self._load_blobs()
+
+        if self.kind == 'full':
+            index = 0 if backward else 1
+            shape, dtype = self.meta[index]
+            return np.frombuffer(zlib.decompress(blobs[index]), dtype=dtype).reshape(shape).copy()
+
+        result = np.array(img, copy=True, order='C')
+        result_bytes = _as_bytes(result)
+        for region, blob in zip(self.regions, blobs):
+            tile = result_bytes[region]
+            xor = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(tile.shape)
+            np.bitwise_xor(tile, xor, out=tile)
+        return result
+
+class EditHistory:
+    """
+    Multi-level undo/redo for the image being edited.
+
+    Each step stores a compressed delta instead of a full copy (see _Delta).
+    A small state object (e.g. the edit graph's chain) can be recorded with
+    each image; undo() and redo() bring it back in `state`.
+    When in-memory deltas exceed max_bytes the oldest are spilled to a temp
+    directory; when the spilled data exceeds max_disk_bytes, or there are more
+    than max_steps undo steps, the oldest steps are dropped.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_disk_bytes=2 * 1024 * 1024 * 1024,
+                 max_steps=100, tile_size=TILE_SIZE, spill=True):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_steps = max_steps
+        self.tile_size = tile_size
+        self.spill = spill
+
+        self.current = None
+        self.state = None
+        self._undo = []
+        self._redo = []
+        self._spill_dir = None
+        self._spill_count = 0
+
+    def reset(self, img, state=None):
+        """Start a new history with img as the only state."""
+        self.clear()
+        self.current = img
+        self.state = state
+
+    def clear(self):
+        for delta in self._undo + self._redo:
+            delta.discard()
+        self._undo = []
+        self._redo = []
+        self.current = None
+        self.state = None
+
+    def push(self, img, state=None):
+        """Record img (and state) as the new current state. Clears the redo stack."""
+        if self.current is None:
+            self.current = img
+            self.state = state
+            return
+
+        delta = _Delta(self.current, img, self.tile_size, (self.state, state))
+        self.current = img
+        has_state = state is not None or self.state is not None
+        self.state = state
+        # ภาพเหมือนเดิมแต่มีสถานะ (เช่นปิดขั้นที่ไม่มีผลกับภาพ) ก็ยังบันทึกไว้ให้ย้อนกลับได้
+        if delta.empty and not has_state:
+            return
+
+        for old in self._redo:
+            old.discard()
+        self._redo = []
+        self._undo.append(delta)
+        self._enforce_budget()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        """Return the previous image, or None if there is nothing to undo."""
+        if not self._undo:
+            return None
+        delta = self._undo.pop()
+        self.current = delta.apply(self.current, backward=True)
+        self.state = delta.states[0]
+        self._redo.append(delta)
+        return self.current
+
+    def redo(self):
+        """Return the next image, or None if there is nothing to redo."""
+        if not self._redo:
+            return None
+        delta = self._redo.pop()
+        self.current = delta.apply(self.current, backward=False)
+        self.state = delta.states[1]
+        self._undo.append(delta)
+        return self.current
+
+    def memory_bytes(self):
+        return sum(d.nbytes for d in self._undo + self._redo if d.path is None)
+
+    def disk_bytes(self):
+        return sum(d.nbytes for d in self._undo + self._redo if d.path is not None)
+
+    def _enforce_budget(self):
+        while len(self._undo) > self.max_steps:
+            self._undo.pop(0).discard()
+
+        if not self.spill:
+            while self._undo and self.memory_bytes() > self.max_bytes:
+                self._undo.pop(0).discard()
+            return
+
+        # undo ที่เก่าที่สุดถูกย้ายลงดิสก์ก่อน
+        for delta in self._undo:
+            if self.memory_bytes() <= self.max_bytes:
+                break
+            if delta.path is None:
+                delta.spill(self._next_spill_path())
+
+        while self._undo and self.disk_bytes() > self.max_disk_bytes:
+            self._undo.pop(0).discard()
+
+    def _next_spill_path(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='photo_editor_history_')
+        self._spill_count += 1
+        return os.path.join(self._spill_dir, f'step_{self._spill_count}.bin')
+
+    def close(self):
+        self.clear()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
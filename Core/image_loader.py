@@ -0,0 +1,177 @@
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+REDUCED_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+def _read_exif_block(path, max_bytes=256 * 1024):
+    """Return the TIFF payload of a JPEG's APP1 Exif segment, or None."""
+    with open(path, 'rb') as f:
+        data = f.read(max_bytes)
+
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker in (0xD9, 0xDA):  # EOI / start of scan: ไม่มี Exif แล้ว
+            return None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return data[pos + 10:pos + 2 + length]
+        pos += 2 + length
+    return None
+
+def _read_ifd(tiff, offset, endian):
+    """Return ({tag: value_or_offset}, next_ifd_offset) for one IFD."""
+    count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+    entries = {}
+    for i in range(count):
+        start = offset + 2 + i * 12
+        tag, typ, n = struct.unpack(endian + 'HHI', tiff[start:start + 8])
+        if typ == 3 and n == 1:  # SHORT เก็บค่าไว้ในตัว entry
+            value = struct.unpack(endian + 'H', tiff[start + 8:start + 10])[0]
+        else:
+            value = struct.unpack(endian + 'I', tiff[start + 8:start + 12])[0]
+        entries[tag] = value
+    next_offset = struct.unpack(endian + 'I', tiff[offset + 2 + count * 12:offset + 6 + count * 12])[0]
+    return entries, next_offset
+
+def read_exif_thumbnail(path):
+    """
+    Decode the JPEG thumbnail embedded in the Exif data of a camera file.
+
+    Only the first few hundred KB of the file are read. The EXIF orientation
+    is applied so the thumbnail matches what cv2.imread returns. Returns a
+    BGR image or None when there is no usable thumbnail.
+    """
+    try:
+        tiff = _read_exif_block(path)
+        if not tiff or tiff[:2] not in (b'II', b'MM'):
+            return None
+        endian = '<' if tiff[:2] == b'II' else '>'
+
+        ifd0_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        ifd0, ifd1_offset = _read_ifd(tiff, ifd0_offset, endian)
+        if not ifd1_offset:
+            return None
+        ifd1, _ = _read_ifd(tiff, ifd1_offset, endian)
+
+        start, length = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not start or not length or start + length > len(tiff):
+            return None
+
+        thumb = cv2.imdecode(np.frombuffer(tiff[start:start + length], np.uint8), cv2.IMREAD_COLOR)
+    except (OSError, struct.error):
+        return None
+
+    if thumb is None:
+        return None
+
+    orientation = ifd0.get(0x0112, 1)
+    if orientation == 3:
+        thumb = cv2.rotate(thumb, cv2.ROTATE_180)
+    elif orientation == 6:
+        thumb = cv2.rotate(thumb, cv2.ROTATE_90_CLOCKWISE)
+    elif orientation == 8:
+        thumb = cv2.rotate(thumb, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return thumb
+
+def _image_size(path):
+    """(width, height) from the file header only, or None."""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+def load_preview(path, max_width, max_height):
+    """
+    Return a quick, reduced-resolution BGR image for display, or None.
+
+    For JPEG files this uses the Exif thumbnail when it is big enough to fill
+    most of the canvas, otherwise a DCT-domain reduced decode
+    (IMREAD_REDUCED_COLOR_2/4/8) that still covers the canvas. Other formats
+    cannot be decoded at reduced size, so None is returned for them.
+    """
+    if not path.lower().endswith(JPEG_EXTENSIONS):
+        return None
+
+    thumb = read_exif_thumbnail(path)
+    if thumb is not None and (thumb.shape[1] >= max_width // 2 or thumb.shape[0] >= max_height // 2):
+        return thumb
+
+    size = _image_size(path)
+    if size is None:
+        return thumb
+
+    width, height = size
+    for factor, flag in REDUCED_FLAGS:
+        if width // factor >= max_width or height // factor >= max_height:
+            preview = cv2.imread(path, flag)
+            if preview is not None:
+                return preview
+            break
+
+    # ภาพเล็กกว่า canvas อยู่แล้ว โหลดเต็มได้เร็ว ไม่ต้องมี preview
+    return thumb
+
+class BackgroundLoader:
+    """
+    Decode full-resolution images on a worker thread.
+
+    The callback runs on the Tk thread (polled with widget.after). Starting a
+    new load supersedes the previous one, whose result is then discarded.
+    """
+
+    def __init__(self, widget, poll_ms=30):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._token = 0
+        self._lock = threading.Lock()
+        self._done = {}
+
+    def load(self, path, callback, flags=cv2.IMREAD_COLOR):
+        with self._lock:
+            self._token += 1
+            token = self._token
+
+        def worker():
+            img = cv2.imread(path, flags)
+            with self._lock:
+                # ถ้ามีการเปิดไฟล์ใหม่ระหว่างนี้ ทิ้งผลลัพธ์ไปเลย
+                if token == self._token:
+                    self._done[token] = img
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.widget.after(self.poll_ms, lambda: self._poll(token, callback))
+        return token
+
+    def cancel(self):
+        with self._lock:
+            self._token += 1
+            self._done.clear()
+
+    def _poll(self, token, callback):
+        with self._lock:
+            if token != self._token:
+                return
+            finished = token in self._done
+            img = self._done.pop(token, None)
+
+        if finished:
+            callback(img)
+        else:
+            self.widget.after(self.poll_ms, lambda: self._poll(token, callback))
@@ -0,0 +1,263 @@
+"""
+Image properties read from file headers only, plus a persistent folder index.
+
+    python -m Core.image_metadata scan photos/ --db photos.db
+    python -m Core.image_metadata query --db photos.db --min-width 4000 --format JPG
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.jpe', '.jfif', '.gif', '.bmp', '.ico',
+                    '.tif', '.tiff', '.webp')
+
+# bit ต่อ pixel ตามที่ cv2.imread(IMREAD_UNCHANGED) จะคืนมา (palette / 1-bit ถูกขยายเป็น 8-bit)
+MODE_BIT_DEPTH = {
+    '1': 8, 'L': 8, 'P': 24, 'PA': 32, 'LA': 32, 'RGB': 24, 'RGBA': 32, 'RGBX': 32,
+    'CMYK': 24, 'YCbCr': 24, 'I;16': 16, 'I;16B': 16, 'I;16L': 16, 'I': 32, 'F': 32,
+}
+
+DEFAULT_DPI = (96, 96)
+
+# PIL เปิดภาพสี 16-bit ต่อช่อง (PNG/TIFF) เป็น 'RGB'/'RGBA' แต่ cv2 คืน uint16
+WIDE_SAMPLE_MODES = ('RGB', 'RGBA', 'RGBX', 'LA')
+
+def _bits_per_sample(img, file_path):
+    """Bits per channel from the file header (PNG IHDR, TIFF BitsPerSample), or None if unknown."""
+    if img.format == 'PNG':
+        with open(file_path, 'rb') as f:
+            header = f.read(25)
+        # signature (8) + chunk length (4) + 'IHDR' (4) + width (4) + height (4) แล้วเป็น bit depth
+        if len(header) == 25 and header[12:16] == b'IHDR':
+            return header[24]
+    elif img.format == 'TIFF':
+        bits = img.tag_v2.get(258)
+        if isinstance(bits, tuple):
+            return max(bits) if bits else None
+        return bits
+    return None
+
+def read_image_header(file_path):
+    """
+    Return a dict of image properties without decoding any pixels.
+
+    PIL's Image.open only parses the header; the pixel data is never loaded.
+    Keys: path, size, mtime_ns, width, height, dpi_x, dpi_y, bit_depth, mode, format.
+    """
+    from PIL import Image
+
+    stat = os.stat(file_path)
+    with Image.open(file_path) as img:
+        width, height = img.size
+        mode = img.mode
+        if mode == 'P' and 'transparency' in img.info:
+            mode = 'PA'
+        dpi = img.info.get('dpi', DEFAULT_DPI)  # ใช้ค่า default 96 ถ้าไม่มีข้อมูล
+        bits = _bits_per_sample(img, file_path)
+
+    bit_depth = MODE_BIT_DEPTH.get(mode)
+    if bit_depth and mode in WIDE_SAMPLE_MODES and bits and bits > 8:
+        bit_depth = bit_depth // 8 * bits
+
+    return {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'width': width,
+        'height': height,
+        'dpi_x': float(dpi[0]),
+        'dpi_y': float(dpi[1]),
+        'bit_depth': bit_depth,
+        'mode': mode,
+        'format': os.path.splitext(file_path)[1].upper()[1:],
+    }
+
+def format_properties(meta):
+    """Human readable text for the Image Properties dialog."""
+    properties_list = [
+        f"Dimension: {meta['width']} x {meta['height']} px",
+        f"Width: {meta['width']} px",
+        f"Height: {meta['height']} px",
+        f"Horizontal Resolution: {meta['dpi_x']:g} dpi",
+        f"Vertical Resolution: {meta['dpi_y']:g} dpi",
+    ]
+    if meta['bit_depth']:
+        properties_list.append(f"Bit Depth: {meta['bit_depth']}-bit")
+
+    size_kb = meta['size'] / 1024
+    if size_kb < 1024:
+        properties_list.append(f"File Size: {size_kb:.2f} KB")
+    else:
+        properties_list.append(f"File Size: {size_kb / 1024:.2f} MB")
+
+    properties_list.append(f"Format: {meta['format']}")
+    return "\n".join(properties_list)
+
+def _iter_image_files(folder, recursive):
+    """Yield (path, size, mtime_ns) using the stat data scandir already has."""
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                yield from _iter_image_files(entry.path, recursive)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            yield os.path.abspath(entry.path), stat.st_size, stat.st_mtime_ns
+
+def _safe_header(path):
+    try:
+        return read_image_header(path), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+class MetadataIndex:
+    """
+    SQLite index of image properties, keyed by path and validated by size + mtime.
+
+    scan() only reads the headers of files that are new or whose size/mtime
+    changed since the last scan, and drops rows of files that disappeared.
+    Files that could not be read are kept with their error so they are not
+    retried until they change.
+    """
+
+    COLUMNS = ('path', 'size', 'mtime_ns', 'width', 'height', 'dpi_x', 'dpi_y',
+               'bit_depth', 'mode', 'format', 'error')
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                dpi_x REAL,
+                dpi_y REAL,
+                bit_depth INTEGER,
+                mode TEXT,
+                format TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS images_format ON images(format);
+            CREATE INDEX IF NOT EXISTS images_width ON images(width);
+            CREATE INDEX IF NOT EXISTS images_height ON images(height);
+        ''')
+
+    def scan(self, folder, recursive=True, workers=8):
+        """Bring the index up to date for folder. Returns (added_or_updated, removed, unchanged)."""
+        folder = os.path.abspath(folder)
+        prefix = os.path.join(folder, '')
+        known = {row['path']: (row['size'], row['mtime_ns']) for row in self.conn.execute(
+            'SELECT path, size, mtime_ns FROM images WHERE substr(path, 1, ?) = ?',
+            (len(prefix), prefix))}
+
+        changed = []
+        seen = set()
+        for path, size, mtime_ns in _iter_image_files(folder, recursive):
+            seen.add(path)
+            if known.get(path) != (size, mtime_ns):
+                changed.append((path, size, mtime_ns))
+
+        # อ่าน header ส่วนใหญ่เป็นงาน I/O ใช้ thread ได้
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            headers = list(pool.map(_safe_header, [path for path, _, _ in changed]))
+
+        rows = []
+        for (path, size, mtime_ns), (meta, error) in zip(changed, headers):
+            if meta is None:
+                meta = {'path': path, 'size': size, 'mtime_ns': mtime_ns}
+            meta['error'] = error
+            rows.append(tuple(meta.get(col) for col in self.COLUMNS))
+
+        removed = [(path,) for path in known if path not in seen
+                   and (recursive or os.path.dirname(path) == folder)]
+
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO images ({", ".join(self.COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(self.COLUMNS))})', rows)
+            self.conn.executemany('DELETE FROM images WHERE path = ?', removed)
+
+        return len(rows), len(removed), len(seen) - len(rows)
+
+    def get(self, path):
+        row = self.conn.execute('SELECT * FROM images WHERE path = ?',
+                                (os.path.abspath(path),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def query(self, folder=None, format=None, min_width=None, min_height=None,
+              max_width=None, max_height=None, limit=None):
+        """Return matching rows (dicts) ordered by path; files with read errors are excluded."""
+        where, args = ['error IS NULL'], []
+        if folder is not None:
+            prefix = os.path.join(os.path.abspath(folder), '')
+            where.append('substr(path, 1, ?) = ?')
+            args += [len(prefix), prefix]
+        if format is not None:
+            where.append('format = ?')
+            args.append(format.upper().lstrip('.'))
+        for column, op, value in (('width', '>=', min_width), ('height', '>=', min_height),
+                                  ('width', '<=', max_width), ('height', '<=', max_height)):
+            if value is not None:
+                where.append(f'{column} {op} ?')
+                args.append(value)
+
+        sql = f'SELECT * FROM images WHERE {" AND ".join(where)} ORDER BY path'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, args)]
+
+    def close(self):
+        self.conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index image properties of a folder without decoding pixels.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = sub.add_parser('scan', help="Add new or changed files to the index")
+    scan_parser.add_argument('folder')
+    scan_parser.add_argument('--db', default='image_index.db')
+    scan_parser.add_argument('--no-recursive', action='store_true')
+    scan_parser.add_argument('--workers', type=int, default=8)
+
+    query_parser = sub.add_parser('query', help="List indexed images")
+    query_parser.add_argument('--db', default='image_index.db')
+    query_parser.add_argument('--folder')
+    query_parser.add_argument('--format')
+    query_parser.add_argument('--min-width', type=int)
+    query_parser.add_argument('--min-height', type=int)
+    query_parser.add_argument('--max-width', type=int)
+    query_parser.add_argument('--max-height', type=int)
+    query_parser.add_argument('--limit', type=int)
+
+    args = parser.parse_args(argv)
+    index = MetadataIndex(args.db)
+    try:
+        if args.command == 'scan':
+            updated, removed, unchanged = index.scan(args.folder, not args.no_recursive, args.workers)
+            print(f"{updated} added/updated, {removed} removed, {unchanged} unchanged")
+        else:
+            rows = index.query(args.folder, args.format, args.min_width, args.min_height,
+                               args.max_width, args.max_height, args.limit)
+            for row in rows:
+                print(f"{row['width']:>6} x {row['height']:<6} {row['bit_depth'] or '?':>3}-bit  {row['path']}")
+            print(f"{len(rows)} image(s)")
+    finally:
+        index.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
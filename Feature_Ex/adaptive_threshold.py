@@ -3,6 +3,9 @@ from tkinter import ttk, filedialog, messagebox
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
+from Feature_Ex.preview_scheduler import PreviewScheduler
+from Feature_Ex.channels import to_gray
+from Feature_Ex.threshold_engine import ThresholdEngine, THRESHOLD_METHODS, adaptive_threshold
 
 def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
     threshold_window = tk.Toplevel(root)
@@ -24,43 +27,51 @@ def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
     c_value_var = tk.IntVar(value=2)
     method_var = tk.StringVar(value="Gaussian")
     
+    # ภาพเทาคำนวณครั้งเดียวต่อหน้าต่าง preview ใช้ภาพย่อขนาด canvas ส่วนความละเอียดเต็มทำตอน Apply
+    img_gray = to_gray(img_cv)
+    preview_scale = min(preview_canvas_width / img_gray.shape[1], preview_canvas_height / img_gray.shape[0], 1.0)
+    preview_gray = cv2.resize(img_gray, (max(1, int(img_gray.shape[1] * preview_scale)),
+                                         max(1, int(img_gray.shape[0] * preview_scale))),
+                              interpolation=cv2.INTER_AREA)
+    preview_engine = ThresholdEngine(preview_gray)
+    engines = {}
+
     processed_images = {
         'original': img_cv,
         'threshold': None,
-        'current': None
+        'current': None,
+        'params': None
     }
 
-    def update_preview():
-        img_gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-        
-        method = cv2.ADAPTIVE_THRESH_GAUSSIAN_C if method_var.get() == "Gaussian" else cv2.ADAPTIVE_THRESH_MEAN_C
+    def current_params():
+        method = method_var.get()
         
         block_size = block_size_var.get()
         if block_size % 2 == 0: 
             block_size += 1
+
+        return method, block_size, c_value_var.get()
+
+    def compute_threshold(method, block_size, c_value):
+        # ความละเอียดเต็ม: สร้าง integral image ครั้งแรกที่ใช้ แล้วใช้ซ้ำ
+        if 'full' not in engines:
+            engines['full'] = ThresholdEngine(img_gray)
+        return engines['full'].threshold(method, block_size, c_value)
+
+    def render_preview(params):
+        # ทำงานบน worker thread ห้ามแตะ widget ของ Tk
+        method, block_size, c_value = params
         
-        threshold_img = cv2.adaptiveThreshold(
-            img_gray, 
-            255, 
-            method, 
-            cv2.THRESH_BINARY, 
-            block_size, 
-            c_value_var.get()
-        )
-        
-        processed_images['threshold'] = threshold_img
-        
-        threshold_rgb = cv2.cvtColor(threshold_img, cv2.COLOR_GRAY2RGB)
-        processed_images['current'] = threshold_rgb
-        
-        img_pil = Image.fromarray(threshold_rgb)
-        img_width, img_height = img_pil.size
-        
-        scale = min(preview_canvas_width / img_width, preview_canvas_height / img_height)
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
+        # ย่อ block size ตามสเกลของ preview เพื่อให้หน้าต่างครอบคลุมพื้นที่เท่าเดิมในภาพ
+        preview_block = max(3, int(round(block_size * preview_scale)) | 1)
+        threshold_img = preview_engine.threshold(method, preview_block, c_value)
         
-        img_pil = img_pil.resize((new_width, new_height), Image.LANCZOS)
+        # ภาพไบนารีช่องเดียวแสดงเป็น PIL mode 'L' ได้เลย ไม่ต้องขยายเป็น RGB
+        return params, Image.fromarray(threshold_img)
+
+    def show_preview(rendered):
+        params, img_pil = rendered
+
         img_tk = ImageTk.PhotoImage(img_pil)
 
         preview_canvas.delete("all")
@@ -70,6 +81,20 @@ def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
         preview_canvas.create_image(x_center, y_center, anchor=tk.CENTER, image=img_tk)
         preview_canvas.image = img_tk
 
+    scheduler = PreviewScheduler(preview_canvas, render_preview, show_preview)
+
+    def update_preview():
+        scheduler.request(current_params())
+
+    def latest_result():
+        # คำนวณที่ความละเอียดเต็มเฉพาะตอนที่ต้องใช้ผลจริง (Apply / Save)
+        params = current_params()
+        if processed_images['params'] != params:
+            processed_images['threshold'] = compute_threshold(*params)
+            processed_images['current'] = processed_images['threshold']
+            processed_images['params'] = params
+        return processed_images['current']
+
     def create_slider_with_label(parent, text, variable, from_=3, to=31, step=2):
         frame = tk.Frame(parent)
         frame.pack(fill=tk.X, pady=5)
@@ -116,7 +141,7 @@ def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
     method_dropdown = ttk.Combobox(
         method_frame, 
         textvariable=method_var, 
-        values=["Gaussian", "Mean"], 
+        values=list(THRESHOLD_METHODS), 
         state="readonly",
         width=20
     )
@@ -124,7 +149,7 @@ def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
     method_dropdown.bind("<<ComboboxSelected>>", lambda x: update_preview())
     
     def save_current_effect():
-        if processed_images['current'] is not None:
+        if latest_result() is not None:
             save_path = filedialog.asksaveasfilename(
                 defaultextension=".jpg",
                 filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png")]
@@ -135,8 +160,11 @@ def create_adaptive_threshold_window(root, img_cv, on_apply_callback):
                 messagebox.showinfo("Success", f"Image saved as {save_path}")
     
     def apply_to_main():
-        if processed_images['current'] is not None:
-            on_apply_callback(processed_images['current'])
+        if latest_result() is not None:
+            method, block_size, c_value = processed_images['params']
+            on_apply_callback(processed_images['current'],
+                              ("Black & White", adaptive_threshold,
+                               {'method': method, 'block_size': block_size, 'c': c_value}))
             threshold_window.destroy()
     
     action_frame = tk.Frame(main_frame)
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+from Feature_Ex.cv_pro import *
+from Feature_Ex.tile_engine import adjust_hsv_tiled, TILED_MIN_PIXELS
+
+# ลำดับการปรับภาพเหมือนกับหน้าต่าง Adjust Photo
+ADJUSTMENT_ORDER = [
+    'brightness', 'contrast', 'highlights', 'shadows', 'saturation',
+    'vibrance', 'temperature', 'blue', 'green', 'red'
+]
+
+# การปรับในโดเมน HSV (ปรับ V หรือ S) ที่อยู่ติดกันรวมเป็น adjust_hsv ครั้งเดียว
+HSV_ADJUSTMENTS = ('brightness', 'highlights', 'shadows', 'saturation', 'vibrance')
+
+# การปรับแบบ pointwise ต่อช่องสี คอมไพล์เป็น LUT 256 ค่าต่อช่องได้
+LUT_ADJUSTMENTS = {
+    'contrast': contrast_lut,
+    'temperature': temperature_lut,
+    'blue': lambda value: color_channel_lut('B', value),
+    'green': lambda value: color_channel_lut('G', value),
+    'red': lambda value: color_channel_lut('R', value),
+}
+
+def compile_adjustments(values):
+    """
+    Compile slider values into a list of steps.
+
+    Consecutive pointwise adjustments are fused into a single ('lut', table)
+    step and consecutive HSV adjustments into a single ('hsv', params) step
+    for adjust_hsv. Zero values are skipped.
+    """
+    steps = []
+    for name in ADJUSTMENT_ORDER:
+        value = values.get(name, 0)
+        if value == 0:
+            continue
+
+        if name in LUT_ADJUSTMENTS:
+            lut = LUT_ADJUSTMENTS[name](value)
+            if steps and steps[-1][0] == 'lut':
+                lut = compose_channel_luts(steps[-1][1], lut)
+                steps[-1] = ('lut', lut)
+            else:
+                steps.append(('lut', lut))
+        elif name in HSV_ADJUSTMENTS:
+            if steps and steps[-1][0] == 'hsv':
+                steps[-1][1][name] = value
+            else:
+                steps.append(('hsv', {name: value}))
+
+    return steps
+
+def run_adjustments(img, steps):
+    if img.dtype != np.uint8:
+        img = np.clip(img, 0, 255).astype(np.uint8)
+
+    # ภาพใหญ่มาก (พาโนรามา/สแกน) ประมวลผลทีละ tile เพื่อจำกัดหน่วยความจำ
+    tiled = img.shape[0] * img.shape[1] >= TILED_MIN_PIXELS
+
+    for step in steps:
+        if step[0] == 'lut':
+            img = apply_channel_lut(img, step[1])
+        elif tiled:
+            img = adjust_hsv_tiled(img, step[1])
+        else:
+            img = adjust_hsv(img, **step[1])
+
+    return img
+
+def apply_adjustments(img, **values):
+    """Apply Adjust Photo slider values (brightness=20, red=-10, ...) to img as one step."""
+    return run_adjustments(img, compile_adjustments(values))
+
+def steps_to_chain(steps):
+    """Convert compiled steps into (op, params) specs for Core.edit_graph.EditGraph.set_chain."""
+    chain = []
+    for step in steps:
+        if step[0] == 'lut':
+            chain.append((apply_channel_lut, {'lut': step[1]}))
+        else:
+            chain.append((adjust_hsv, dict(step[1])))
+    return chain
+
+def make_preview_proxy(img, max_width, max_height):
+    """Downscale img (INTER_AREA) so it fits max_width x max_height; never upscales."""
+    height, width = img.shape[:2]
+    scale = min(max_width / width, max_height / height)
+    if scale >= 1.0:
+        return img
+
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
@@ -5,6 +5,10 @@ from PIL import Image, ImageTk
 import cv2
 import numpy as np
 from Feature_Ex.cv_pro import *
+from Feature_Ex.adjust_pipeline import (compile_adjustments, run_adjustments, apply_adjustments,
+                                       make_preview_proxy, steps_to_chain)
+from Core.edit_graph import EditGraph
+from Feature_Ex.preview_scheduler import PreviewScheduler
 
 def create_adjust_window(root, img_cv, on_apply_callback):
     if img_cv is None:
@@ -24,10 +28,17 @@ def create_adjust_window(root, img_cv, on_apply_callback):
     color_frame = tk.LabelFrame(left_frame, text="Color Channels", padx=10, pady=5)
     color_frame.pack(fill="x", pady=10)
     
-    preview_canvas = tk.Canvas(adjust_window, width=700, height=600)
+    preview_width, preview_height = 700, 600
+    preview_canvas = tk.Canvas(adjust_window, width=preview_width, height=preview_height)
     preview_canvas.pack(side="right", padx=20, pady=20)
     
     current_preview = {'img_pil': None}
+
+    # ภาพย่อขนาดเท่า canvas สำหรับ preview ตอนเลื่อน slider
+    # ภาพเต็มความละเอียดจะคำนวณครั้งเดียวตอนกด Apply
+    img_proxy = make_preview_proxy(img_cv, preview_width, preview_height)
+    if img_proxy.dtype != np.uint8:
+        img_proxy = np.clip(img_proxy, 0, 255).astype(np.uint8)
     
     sliders_vars = {
         'brightness': tk.IntVar(value=0),
@@ -81,41 +92,32 @@ def create_adjust_window(root, img_cv, on_apply_callback):
         
         return frame
 
-    def update_image(*args):
-        img_adjusted = img_cv.copy()
-        
-        # ปรับค่าพื้นฐาน
-        adjustments = {
-            'brightness': adjust_brightness,
-            'contrast': adjust_contrast,
-            'highlights': adjust_highlights,
-            'shadows': adjust_shadows,
-            'saturation': adjust_saturation,
-            'vibrance': adjust_vibrance,
-            'temperature': adjust_temperature
-        }
-        
-        for name, func in adjustments.items():
-            if sliders_vars[name].get() != 0:
-                img_adjusted = func(img_adjusted, sliders_vars[name].get())
-        
-        colors = {'blue': 'B', 'green': 'G', 'red': 'R'}
-        for name, color in colors.items():
-            if sliders_vars[name].get() != 0:
-                img_adjusted = adjust_color_channel(img_adjusted, color, sliders_vars[name].get())
-        
-        if img_adjusted.dtype != np.uint8:
-            img_adjusted = np.clip(img_adjusted, 0, 255).astype(np.uint8)
-        
-        img_rgb = cv2.cvtColor(img_adjusted, cv2.COLOR_BGR2RGB)
-        current_preview['img_pil'] = Image.fromarray(img_rgb)
-        current_preview['img_pil'].thumbnail((700, 600))
-        img_tk = ImageTk.PhotoImage(current_preview['img_pil'])
+    def current_steps():
+        # contrast, temperature และ B/G/R ถูกรวมเป็น LUT เดียวต่อช่องสี
+        return compile_adjustments({name: var.get() for name, var in sliders_vars.items()})
+
+    # เก็บผลลัพธ์ของแต่ละขั้นไว้ เลื่อน slider ตัวไหนก็คำนวณใหม่เฉพาะขั้นที่อยู่หลังจากนั้น
+    preview_graph = EditGraph(img_proxy, cache_bytes=64 * 1024 * 1024)
+
+    def render_preview(steps):
+        # ทำงานบน worker thread ห้ามแตะ widget ของ Tk
+        preview_graph.set_chain(steps_to_chain(steps))
+        img_adjusted = preview_graph.output()
+        return to_pil_image(img_adjusted)
+
+    def show_preview(img_pil):
+        current_preview['img_pil'] = img_pil
+        img_tk = ImageTk.PhotoImage(img_pil)
         
         preview_canvas.delete("all")
-        preview_canvas.create_image(350, 300, anchor=tk.CENTER, image=img_tk)
+        preview_canvas.create_image(preview_width // 2, preview_height // 2, anchor=tk.CENTER, image=img_tk)
         preview_canvas.image = img_tk
 
+    scheduler = PreviewScheduler(preview_canvas, render_preview, show_preview)
+
+    def update_image(*args):
+        scheduler.request(current_steps())
+
     sliders_info = [
         ("Brightness", 'brightness'),
         ("Contrast", 'contrast'),
@@ -142,9 +144,10 @@ def create_adjust_window(root, img_cv, on_apply_callback):
     button_frame.pack(pady=20)
     
     def apply_changes():
-        update_image()
-        adjusted_img = cv2.cvtColor(np.array(current_preview['img_pil']), cv2.COLOR_RGB2BGR)
-        on_apply_callback(adjusted_img)
+        adjusted_img = run_adjustments(img_cv, current_steps())
+        # ส่งค่า slider ไปด้วย ให้หน้าหลักคำนวณขั้นนี้ใหม่ได้เมื่อขั้นก่อนหน้าถูกปิดหรือสลับลำดับ
+        values = {name: var.get() for name, var in sliders_vars.items() if var.get()}
+        on_apply_callback(adjusted_img, ("Adjust", apply_adjustments, values))
         adjust_window.destroy()
     
     apply_btn = tk.Button(button_frame, text="Apply", command=apply_changes,
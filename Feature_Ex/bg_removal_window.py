@@ -3,6 +3,12 @@ from tkinter import ttk, Scale, IntVar
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
+from Feature_Ex.preview_scheduler import PreviewScheduler
+from Feature_Ex.channels import to_pil_image
+from Feature_Ex.grabcut import GrabCutSession
+
+# รัศมีของแปรงระบาย foreground/background (px บน canvas)
+BRUSH_RADIUS = 6
 
 def create_bg_removal_window(parent, img, callback_fn):
     if img is None:
@@ -18,20 +24,31 @@ def create_bg_removal_window(parent, img, callback_fn):
     blur_var = IntVar(value=5)
     threshold_var = IntVar(value=0)
     iterations_var = IntVar(value=5)
+    quality_var = tk.StringVar(value="balanced")
+    tool_var = tk.StringVar(value="rect")
     method_var = tk.StringVar(value="simple")
     
-    # สร้างสำเนาของภาพต้นฉบับ
-    original_img = img.copy()
-    current_img = img.copy()
+    # ภาพที่ได้รับเป็นแบบอ่านอย่างเดียว ทุกวิธีลบพื้นหลังคืนภาพใหม่ จึงไม่ต้องทำสำเนา
+    original_img = img
+    current_img = img
+    
+    # ผล blur/quantize/Otsu ของภาพนี้ตาม blur amount เลื่อน threshold แล้วไม่ต้องคำนวณใหม่
+    otsu_cache = {}
+    
+    # GrabCut session เก็บ mask และ model ไว้ระหว่างการปรับ จะสร้างใหม่เมื่อเปลี่ยน quality
+    grabcut_session = None
+    
+    # ตำแหน่งและสเกลของภาพบน canvas ใช้แปลงพิกัดเมาส์เป็นพิกัดภาพ
+    view = {'x0': 0, 'y0': 0, 'scale': 1.0}
+    drag = {'start': None, 'points': []}
     
     # ฟังก์ชันสำหรับแสดงผลภาพ
     def display_preview(img_to_show):
         nonlocal current_img
-        current_img = img_to_show.copy()
+        current_img = img_to_show
         
         # สร้างภาพสำหรับแสดงผล
-        img_rgb = cv2.cvtColor(img_to_show, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb)
+        img_pil = to_pil_image(img_to_show)
         
         # ปรับขนาดให้พอดีกับ canvas
         canvas_width = preview_canvas.winfo_width()
@@ -45,33 +62,140 @@ def create_bg_removal_window(parent, img, callback_fn):
         img_pil.thumbnail((canvas_width, canvas_height))
         img_tk = ImageTk.PhotoImage(img_pil)
         
+        view['scale'] = img_pil.width / img_to_show.shape[1]
+        view['x0'] = canvas_width // 2 - img_pil.width // 2
+        view['y0'] = canvas_height // 2 - img_pil.height // 2
+        
         # แสดงภาพบน canvas
         preview_canvas.delete("all")
         preview_canvas.create_image(canvas_width//2, canvas_height//2, anchor=tk.CENTER, image=img_tk)
         preview_canvas.image = img_tk
     
-    # ฟังก์ชันสำหรับประมวลผลภาพ
-    def process_image():
-        from Feature_Ex.cv_pro import bgremove1, bgremove_smooth, bgremove_grabcut
+    # ฟังก์ชันสำหรับประมวลผลภาพ (ไม่แตะ widget ของ Tk จึงรันบน worker thread ได้)
+    def compute_result(params, cancelled=lambda: False):
+        from Feature_Ex.cv_pro import bgremove1, bgremove_smooth, white_background
         
-        method = method_var.get()
+        method = params[0]
         
         if method == "simple":
             result = bgremove1(original_img)
         elif method == "smooth":
-            blur = blur_var.get()
-            thresh_offset = threshold_var.get()
-            result = bgremove_smooth(original_img, blur, thresh_offset)
+            _, blur, thresh_offset = params
+            result = bgremove_smooth(original_img, blur, thresh_offset, otsu_cache)
         elif method == "grabcut":
-            iterations = iterations_var.get()
-            result = bgremove_grabcut(original_img, iterations)
+            _, iterations, session, _ = params
+            # session ทำเฉพาะรอบที่ยังไม่ได้ทำ หรือเฉพาะการแก้ด้วยเส้นที่เพิ่มมา
+            session.run(iterations)
+            # มีค่าใหม่รออยู่แล้ว ไม่ต้องขยาย mask กลับเป็นความละเอียดเต็ม
+            if cancelled():
+                return None
+            result = white_background(session.img, session.foreground_mask())
         
+        return result
+    
+    # อ่านค่าจาก widget บน Tk thread
+    def current_params():
+        method = method_var.get()
+        if method == "smooth":
+            return (method, blur_var.get(), threshold_var.get())
+        if method == "grabcut":
+            session = get_session()
+            return (method, iterations_var.get(), session, session.version)
+        return (method,)
+    
+    def render_result(params):
+        result = compute_result(params, scheduler.cancelled)
+        if result is None:
+            return None
+        return params, result
+    
+    def show_result(rendered):
+        nonlocal current_params_shown
+        current_params_shown, result = rendered
         display_preview(result)
     
+    current_params_shown = None
+    
+    # ขั้นตอนที่หน้าหลักใช้คำนวณผลนี้ใหม่ได้ (label, op, params) เมื่อขั้นก่อนหน้าถูกปิดหรือสลับลำดับ
+    def step_for(params):
+        from Feature_Ex.cv_pro import bgremove1, bgremove_smooth, bgremove_grabcut
+        
+        method = params[0]
+        if method == "smooth":
+            _, blur, thresh_offset = params
+            return ("Remove Background (Smooth)", bgremove_smooth,
+                    {'blur_amount': blur, 'threshold_offset': thresh_offset})
+        if method == "grabcut":
+            _, iterations, session, _ = params
+            return ("Remove Background (GrabCut)", bgremove_grabcut,
+                    {'iterations': iterations, 'quality': session.quality,
+                     'rect': session.rect, 'strokes': list(session.strokes)})
+        return ("Remove Background", bgremove1, {})
+    
+    def get_session():
+        nonlocal grabcut_session
+        quality = quality_var.get()
+        if grabcut_session is None or grabcut_session.quality != quality:
+            session = GrabCutSession(original_img, quality)
+            if grabcut_session is not None:
+                session.copy_edits_from(grabcut_session)
+            grabcut_session = session
+        return grabcut_session
+    
+    def to_image_coords(x, y):
+        return ((x - view['x0']) / view['scale'], (y - view['y0']) / view['scale'])
+    
+    # วาดสี่เหลี่ยมหรือระบาย foreground/background บน preview (เฉพาะโหมด GrabCut)
+    def on_press(event):
+        if method_var.get() != "grabcut":
+            return
+        drag['start'] = (event.x, event.y)
+        drag['points'] = [(event.x, event.y)]
+    
+    def on_drag(event):
+        if drag['start'] is None:
+            return
+        if tool_var.get() == "rect":
+            preview_canvas.delete("overlay")
+            x0, y0 = drag['start']
+            preview_canvas.create_rectangle(x0, y0, event.x, event.y, outline="yellow",
+                                            width=2, tags="overlay")
+        else:
+            last = drag['points'][-1]
+            color = "white" if tool_var.get() == "fg" else "black"
+            preview_canvas.create_line(last[0], last[1], event.x, event.y, fill=color,
+                                       width=2 * BRUSH_RADIUS, capstyle=tk.ROUND, tags="overlay")
+            drag['points'].append((event.x, event.y))
+    
+    def on_release(event):
+        if drag['start'] is None:
+            return
+        session = get_session()
+        if tool_var.get() == "rect":
+            (x0, y0), (x1, y1) = map(lambda p: to_image_coords(*p), (drag['start'], (event.x, event.y)))
+            height, width = original_img.shape[:2]
+            x0, x1 = sorted((min(max(x0, 0), width), min(max(x1, 0), width)))
+            y0, y1 = sorted((min(max(y0, 0), height), min(max(y1, 0), height)))
+            if x1 - x0 >= 2 and y1 - y0 >= 2:
+                session.set_rect((x0, y0, x1 - x0, y1 - y0))
+        else:
+            points = [to_image_coords(*p) for p in drag['points']]
+            session.add_stroke(points, tool_var.get() == "fg", BRUSH_RADIUS / view['scale'])
+        drag['start'] = None
+        process_image()
+    
+    def process_image():
+        scheduler.request(current_params())
+    
     # ฟังก์ชันเมื่อกดปุ่ม Apply
     def on_apply():
+        nonlocal current_img
+        # ถ้า preview ยังประมวลผลไม่เสร็จ ให้คำนวณด้วยค่าปัจจุบันก่อน
+        params = current_params()
+        if current_params_shown != params:
+            current_img = compute_result(params)
         if callback_fn:
-            callback_fn(current_img)
+            callback_fn(current_img, step_for(params))
         window.destroy()
     
     # ฟังก์ชันเมื่อกดปุ่ม Cancel
@@ -155,6 +279,26 @@ def create_bg_removal_window(parent, img, callback_fn):
                             variable=iterations_var, command=lambda _: process_image())
     iterations_scale.pack(side="right", fill="x", expand=True)
     
+    # Quality: Fast/Balanced/High รันบนภาพย่อแล้ว refine เฉพาะขอบ, Full รันที่ความละเอียดเต็ม
+    quality_frame = ttk.Frame(grabcut_frame)
+    quality_frame.pack(fill="x", pady=5)
+    
+    ttk.Label(quality_frame, text="Quality:").pack(side="left")
+    
+    quality_combo = ttk.Combobox(quality_frame, textvariable=quality_var, state="readonly",
+                                 values=("fast", "balanced", "high", "full"), width=10)
+    quality_combo.pack(side="right")
+    quality_combo.bind("<<ComboboxSelected>>", lambda _: process_image())
+    
+    # เครื่องมือบน preview: ลากสี่เหลี่ยมรอบวัตถุ หรือระบายส่วนที่ต้องการเก็บ/ลบ
+    ttk.Label(grabcut_frame, text="Draw on preview:").pack(anchor="w", pady=(5, 0))
+    ttk.Radiobutton(grabcut_frame, text="Rectangle", variable=tool_var,
+                   value="rect").pack(anchor="w", padx=20)
+    ttk.Radiobutton(grabcut_frame, text="Foreground brush", variable=tool_var,
+                   value="fg").pack(anchor="w", padx=20)
+    ttk.Radiobutton(grabcut_frame, text="Background brush", variable=tool_var,
+                   value="bg").pack(anchor="w", padx=20)
+    
     # ปุ่ม Process
     process_button = ttk.Button(control_frame, text="Process", command=process_image)
     process_button.pack(fill="x", pady=10)
@@ -175,6 +319,11 @@ def create_bg_removal_window(parent, img, callback_fn):
     
     # แสดงภาพต้นฉบับ
     preview_canvas.bind("<Configure>", lambda e: display_preview(current_img))
+    preview_canvas.bind("<ButtonPress-1>", on_press)
+    preview_canvas.bind("<B1-Motion>", on_drag)
+    preview_canvas.bind("<ButtonRelease-1>", on_release)
+    
+    scheduler = PreviewScheduler(preview_canvas, render_result, show_result)
     
     # เริ่มต้นด้วยวิธี Simple
     on_method_change()
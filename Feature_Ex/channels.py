@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+# ภาพขาวดำ/ไบนารีเก็บเป็น uint8 ช่องเดียว (H x W) ตลอด pipeline
+# ขยายเป็น 3 ช่องเฉพาะตอนที่ operation ต้องการสีจริง ๆ เท่านั้น
+
+def is_gray(img):
+    return img.ndim == 2 or (img.ndim == 3 and img.shape[2] == 1)
+
+def to_uint8(img):
+    if img.dtype != np.uint8:
+        img = np.clip(img, 0, 255).astype(np.uint8)
+    return img
+
+def to_gray(img):
+    """Return a single-channel uint8 image (no copy if img already is one)."""
+    img = to_uint8(img)
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 1:
+        return img[:, :, 0]
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def to_bgr(img):
+    """Return a 3-channel BGR uint8 image for operations that need colour."""
+    img = to_uint8(img)
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if img.shape[2] == 1:
+        return cv2.cvtColor(img[:, :, 0], cv2.COLOR_GRAY2BGR)
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    return img
+
+def to_pil_image(img):
+    """Convert a gray, BGR or BGRA array to a PIL image for display; gray stays mode 'L'."""
+    from PIL import Image
+
+    img = to_uint8(img)
+    if is_gray(img):
+        return Image.fromarray(img.reshape(img.shape[:2]))
+    if img.shape[2] == 4:
+        return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA))
+    return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
@@ -2,115 +2,109 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+from Feature_Ex.channels import is_gray, to_uint8, to_gray, to_bgr, to_pil_image
 
 def read_image(file_path):
     img = cv2.imread(file_path) 
     return img
 
 def Grayscale_Luminosity(img_cv):
-    if img_cv.dtype != np.uint8:
-        img_cv = np.clip(img_cv, 0, 255).astype(np.uint8)
-        
-    b, g, r = cv2.split(img_cv)
-    gray_luminosity = 0.299*r + 0.587*g + 0.114*b
-    gray_img = np.stack((gray_luminosity, gray_luminosity, gray_luminosity), axis=-1)  
-    return gray_img
+    # 0.299*R + 0.587*G + 0.114*B คืนค่าเป็น uint8 ช่องเดียว (H x W)
+    # cvtColor ใช้น้ำหนักเดียวกันแต่ไม่ต้องสร้าง float64 สามช่อง
+    return to_gray(img_cv)
 
 def BackAndWhite(img_cv):
-    if img_cv.dtype != np.uint8:
-        img_cv = np.clip(img_cv, 0, 255).astype(np.uint8)
-        
-    img_gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+    img_gray = to_gray(img_cv)
     thresh, img_black = cv2.threshold(img_gray, 135, 255, cv2.THRESH_BINARY)
-    img_black_3ch = cv2.cvtColor(img_black, cv2.COLOR_GRAY2BGR)
-    return img_black_3ch
+    return img_black
 
 def check_image_properties(file_path):
-    img = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
-    if img is None:
-        return "Error: Cannot load image."
-
-    from PIL import Image
+    # อ่านเฉพาะ header ของไฟล์ ไม่ต้อง decode ทั้งภาพ
+    from Core.image_metadata import read_image_header, format_properties
     try:
-        pil_img = Image.open(file_path)
-        dpi = pil_img.info.get('dpi', (96, 96))  # ใช้ค่า default 96 ถ้าไม่มีข้อมูล
+        meta = read_image_header(file_path)
     except Exception:
-        dpi = (96, 96)  # ถ้าเกิดข้อผิดพลาด ใช้ค่า default
-    
-    height, width = img.shape[:2]
-
-    properties_list = []
-    
-    properties_list.append(f"Dimension: {width} x {height} px")
-    properties_list.append(f"Width: {width} px")
-    properties_list.append(f"Height: {height} px")
-
-    properties_list.append(f"Horizontal Resolution: {dpi[0]} dpi")
-    properties_list.append(f"Vertical Resolution: {dpi[1]} dpi")
-
-    if len(img.shape) == 2:  # Grayscale
-        bit_depth = img.dtype.itemsize * 8
-    elif len(img.shape) == 3:  # RGB, RGBA
-        bit_depth = img.dtype.itemsize * 8 * img.shape[2]
+        return "Error: Cannot load image."
+    return format_properties(meta)
 
-    if bit_depth:
-        properties_list.append(f"Bit Depth: {bit_depth}-bit")
-
-    file_size = os.path.getsize(file_path)
-    size_kb = file_size / 1024
-    if size_kb < 1024:
-        properties_list.append(f"File Size: {size_kb:.2f} KB")
-    else:
-        size_mb = size_kb / 1024
-        properties_list.append(f"File Size: {size_mb:.2f} MB")
-    
-    file_format = os.path.splitext(file_path)[1].upper()[1:]
-    properties_list.append(f"Format: {file_format}")
-    
-    return "\n".join(properties_list) if properties_list else "No valid properties found."
+def brightness_lut(value):
+    levels = np.arange(256, dtype=np.uint8).reshape(1, 256)
+    return cv2.add(levels, value).reshape(256)
 
 def adjust_brightness(img, value):
     """Adjust the brightness of the image."""
+    if is_gray(img):
+        # ภาพเทา: V ของ HSV คือค่าเทาเอง
+        return cv2.add(img, value)
+
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
     h, s, v = cv2.split(hsv)
-    v = cv2.add(v, value)
-    v = np.clip(v, 0, 255)
+    v = cv2.LUT(v, brightness_lut(value))
     hsv = cv2.merge((h, s, v))
     return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
 
-def adjust_contrast(img, value):
+def apply_channel_lut(img, lut):
+    """
+    Apply a (256, 3) per-channel lookup table to an image in a single pass.
+
+    Gray images stay single-channel when all three tables are equal; otherwise
+    they are expanded to BGR first. The alpha channel of BGRA is left as is.
+    """
+    if is_gray(img):
+        if (lut == lut[:, :1]).all():
+            return cv2.LUT(img, np.ascontiguousarray(lut[:, 0]))
+        img = to_bgr(img)
+
+    if img.shape[2] == 4:
+        alpha = np.arange(256, dtype=np.uint8).reshape(256, 1)
+        lut = np.hstack([lut, alpha])
+
+    return cv2.LUT(img, np.ascontiguousarray(lut).reshape(1, 256, img.shape[2]))
+
+def compose_channel_luts(first, second):
+    """Return the LUT equivalent to applying `first` and then `second`."""
+    return np.take_along_axis(second, first.astype(np.intp), axis=0)
+
+def contrast_lut(value):
     # แปลงค่า value เป็นค่า alpha
     # -100 -> 0.5, 0 -> 1.0, 100 -> 2.0
     alpha = 1.0 + (value / 300.0)  # ปรับช่วงให้เหมาะสมกว่าเดิม
-    
+
     # ปรับ contrast โดยใช้จุดกึ่งกลาง 128 เป็นจุดอ้างอิง
-    adjusted = cv2.convertScaleAbs(img, alpha=alpha, beta=128 * (1 - alpha))
-    
-    return adjusted
+    levels = np.arange(256, dtype=np.uint8).reshape(1, 256)
+    table = cv2.convertScaleAbs(levels, alpha=alpha, beta=128 * (1 - alpha)).reshape(256)
+    return np.stack([table, table, table], axis=1)
 
-def adjust_saturation(img, value):
+def adjust_contrast(img, value):
+    return apply_channel_lut(img, contrast_lut(value))
+
+def saturation_lut(value):
     # แปลงค่า value เป็น factor (-100 -> 0.0, 0 -> 1.0, 100 -> 2.0)
     factor = 1.0 + (value / 250.0)
-    
-    # แปลงเป็น HSV
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-    h, s, v = cv2.split(hsv)
-    
+
     # ปรับ saturation โดยใช้การคูณ (multiplicative scaling)
-    s = s * factor
-    s = np.clip(s, 0, 255)
-    
-    # รวมช่องสีและแปลงกลับ
-    hsv = cv2.merge([h, s, v]).astype(np.uint8)
+    s = np.arange(256, dtype=np.float32) * factor
+    return np.clip(s, 0, 255).astype(np.uint8)
+
+def adjust_saturation(img, value):
+    if is_gray(img):
+        # ภาพเทาไม่มี saturation
+        return img.copy()
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    h, s, v = cv2.split(hsv)
+    s = cv2.LUT(s, saturation_lut(value))
+    hsv = cv2.merge([h, s, v])
     return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
 
-def adjust_temperature(img, value):
+def temperature_lut(value):
     # แปลงค่า value เป็นเปอร์เซ็นต์ของการปรับ
     factor = value / 250.0
-    
-    # แยกช่องสี
-    b, g, r = cv2.split(img.astype(np.float32))
-    
+
+    # คำนวณบนค่า 0..255 ทุกค่าแทนการคำนวณทุกพิกเซล
+    levels = np.arange(256, dtype=np.float32)
+    b, g, r = levels, levels, levels
+
     # ปรับสมดุลสีแบบ color temperature
     if factor > 0:  # อุ่นขึ้น (เพิ่มสีส้ม)
         r = r * (1 + factor * 0.5)  # เพิ่มสีแดงน้อยลง
@@ -119,76 +113,136 @@ def adjust_temperature(img, value):
         r = r * (1 + factor * 0.3)  # ลดสีแดง
         b = b * (1 - factor * 0.5)  # เพิ่มสีน้ำเงินน้อยลง
 
-    adjusted = cv2.merge([b, g, r])
-    adjusted = np.clip(adjusted, 0, 255).astype(np.uint8)
-    
-    return adjusted
+    return np.clip(np.stack([b, g, r], axis=1), 0, 255).astype(np.uint8)
+
+def adjust_temperature(img, value):
+    return apply_channel_lut(img, temperature_lut(value))
+
+def highlights_lut(value, max_v):
+    v = np.arange(256, dtype=np.float32)
 
-def adjust_highlights(img, value):
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-    h, s, v = cv2.split(hsv)
-    
     # สร้าง weight map สำหรับ highlights แบบ gradual
-    max_v = np.max(v)
-    highlight_weight = np.clip((v - 127) / (max_v - 127), 0, 1)
-    
+    highlight_weight = np.clip((v - 127) / (np.float32(max_v) - 127), 0, 1)
+
     # ปรับค่า factor (-100 -> 0.5, 0 -> 1.0, 100 -> 1.5)
     factor = 1.0 + (value / 250.0)
-    
+
     # ปรับค่าความสว่างตาม weight
     adjustment = (v * factor - v) * highlight_weight
-    v = v + adjustment
-    
-    v = np.clip(v, 0, 255).astype(np.uint8)
-    hsv = cv2.merge([h.astype(np.uint8), s.astype(np.uint8), v])
-    
-    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    return np.clip(v + adjustment, 0, 255).astype(np.uint8)
+
+def shadows_lut(value, min_v):
+    v = np.arange(256, dtype=np.float32)
 
-def adjust_shadows(img, value):
-    # แปลงเป็น HSV และใช้ float32 สำหรับการคำนวณ
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-    h, s, v = cv2.split(hsv)
-    
     # สร้าง weight map สำหรับ shadows แบบ gradual
-    min_v = np.min(v)
-    shadow_weight = np.clip((127 - v) / (127 - min_v), 0, 1)
-    
+    shadow_weight = np.clip((127 - v) / (127 - np.float32(min_v)), 0, 1)
+
     # ปรับค่า factor (-100 -> 0.5, 0 -> 1.0, 100 -> 1.5)
     factor = 1.0 + (value / 200.0)
-    
+
     # ปรับค่าความสว่างตาม weight
     adjustment = (v * factor - v) * shadow_weight
-    v = v + adjustment
-    
-    # clip และแปลงกลับเป็น uint8
-    v = np.clip(v, 0, 255).astype(np.uint8)
-    hsv = cv2.merge([h.astype(np.uint8), s.astype(np.uint8), v])
-    
-    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    return np.clip(v + adjustment, 0, 255).astype(np.uint8)
+
+def vibrance_lut(value):
+    s = np.arange(256, dtype=np.uint8)
 
-def adjust_vibrance(img, value):
-    # แปลงเป็น HSV
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    
-    # คำนวณค่าความอิ่มตัวเฉลี่ย
-    sat_mean = np.mean(s)
-    
     # ปรับค่า factor ตามความอิ่มตัวปัจจุบัน
     factor = 1.0 + (value / 200.0)
-    
+
     # ปรับแต่งความอิ่มตัวแบบไม่เท่ากัน
     adjustment = (1 - (s / 255.0)) * factor
-    s = np.clip(s * (1 + adjustment), 0, 255).astype(np.uint8)
-    
-    # รวมช่องสีและแปลงกลับ
+    return np.clip(s * (1 + adjustment), 0, 255).astype(np.uint8)
+
+def _adjust_v(img, lut_for_v):
+    """Apply a V-channel LUT built from the image's own V; gray images use the gray value as V."""
+    if is_gray(img):
+        return cv2.LUT(img, lut_for_v(img)).reshape(img.shape)
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    h, s, v = cv2.split(hsv)
+    v = cv2.LUT(v, lut_for_v(v))
+    return cv2.cvtColor(cv2.merge([h, s, v]), cv2.COLOR_HSV2BGR)
+
+def adjust_highlights(img, value):
+    return _adjust_v(img, lambda v: highlights_lut(value, np.max(v)))
+
+def adjust_shadows(img, value):
+    return _adjust_v(img, lambda v: shadows_lut(value, np.min(v)))
+
+def adjust_vibrance(img, value):
+    if is_gray(img):
+        return img.copy()
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    h, s, v = cv2.split(hsv)
+    s = cv2.LUT(s, vibrance_lut(value))
     adjusted = cv2.merge([h, s, v])
     return cv2.cvtColor(adjusted, cv2.COLOR_HSV2BGR)
 
-def adjust_color_channel(img, color, value):
-    img_float = img.astype(np.float32)
-    b, g, r = cv2.split(img_float)
-    
+def value_histogram(v):
+    """256-bin histogram of a uint8 V (or gray) plane."""
+    return np.bincount(v.reshape(-1), minlength=256)
+
+def hsv_luts(brightness=0, highlights=0, shadows=0, saturation=0, vibrance=0, v_hist=None):
+    """
+    Build the (V, S) lookup tables equivalent to running the adjustments in
+    the Adjust Photo order: brightness, highlights, shadows on V and
+    saturation, vibrance on S. Zero values are skipped.
+
+    Highlights and shadows depend on the max/min V after the previous steps;
+    they are read from v_hist, the histogram of the input V, mapped through
+    the table built so far, so no extra pass over the pixels is needed.
+    """
+    levels = np.arange(256, dtype=np.uint8)
+    present = np.flatnonzero(v_hist) if v_hist is not None else levels
+
+    v_lut = levels
+    if brightness:
+        v_lut = brightness_lut(brightness)
+    if highlights:
+        v_lut = highlights_lut(highlights, v_lut[present].max())[v_lut]
+    if shadows:
+        v_lut = shadows_lut(shadows, v_lut[present].min())[v_lut]
+
+    s_lut = levels
+    if saturation:
+        s_lut = saturation_lut(saturation)
+    if vibrance:
+        s_lut = vibrance_lut(vibrance)[s_lut]
+
+    return v_lut, s_lut
+
+def adjust_hsv(img, brightness=0, highlights=0, shadows=0, saturation=0, vibrance=0, v_hist=None):
+    """
+    Brightness, highlights, shadows, saturation and vibrance in a single HSV pass.
+
+    The image is converted to HSV once, V and S go through one LUT each and it
+    is converted back once, instead of one round trip (and float copies) per
+    adjustment. v_hist may be given when processing tiles so the whole-image
+    statistics are used. With every value at 0 the input is returned unchanged.
+    """
+    if not (brightness or highlights or shadows or saturation or vibrance):
+        return img.copy()
+
+    if is_gray(img):
+        # ภาพเทา: ค่าเทาคือ V และไม่มี saturation
+        if v_hist is None and (highlights or shadows):
+            v_hist = value_histogram(img)
+        v_lut, _ = hsv_luts(brightness, highlights, shadows, 0, 0, v_hist)
+        return cv2.LUT(img, v_lut).reshape(img.shape)
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    h, s, v = cv2.split(hsv)
+    if v_hist is None and (highlights or shadows):
+        v_hist = value_histogram(v)
+    v_lut, s_lut = hsv_luts(brightness, highlights, shadows, saturation, vibrance, v_hist)
+    return cv2.cvtColor(cv2.merge([h, cv2.LUT(s, s_lut), cv2.LUT(v, v_lut)]), cv2.COLOR_HSV2BGR)
+
+def color_channel_lut(color, value):
+    levels = np.arange(256, dtype=np.float32)
+    b, g, r = levels, levels, levels
+
     # ปรับค่า factor แบบไม่เป็นเชิงเส้น เพื่อให้การควบคุมละเอียดขึ้น
     if value >= 0:
         factor = 1.0 + (value / 300.0) ** 0.8
@@ -208,55 +262,65 @@ def adjust_color_channel(img, color, value):
         r = np.clip(r * factor, 0, 255)
         b = np.clip(b * (1 - abs(value) / 500), 0, 255)
         g = np.clip(g * (1 - abs(value) / 500), 0, 255)
-    
-    return cv2.merge([b, g, r]).astype(np.uint8)
 
-def bgremove1(img):
+    return np.stack([b, g, r], axis=1).astype(np.uint8)
+
+def adjust_color_channel(img, color, value):
+    return apply_channel_lut(img, color_channel_lut(color, value))
+
+# ค่าสีถูกแบ่งเป็น 6 ระดับ (0, 51, ..., 255) เหมือน np.digitize(x, bins, right=True) * 51
+QUANTIZE_BINS = np.array([0, 51, 102, 153, 204, 255])
+QUANTIZE_LUT = (np.digitize(np.arange(256), QUANTIZE_BINS, right=True) * 51).astype(np.uint8)
+
+# จำนวนผลของ otsu_intermediates ที่เก็บไว้ต่อภาพ (ประมาณ 4 byte ต่อพิกเซลต่อรายการ)
+OTSU_CACHE_SIZE = 2
+
+def otsu_intermediates(img, blur_amount=5):
     """
-    ลบพื้นหลังโดยใช้ Otsu Thresholding
-    
-    Parameters:
-    - img: ภาพต้นฉบับ (BGR)
-    
-    Returns:
-    - finalimage: ภาพที่ลบพื้นหลังแล้ว
+    Blur, quantize and convert to gray as the Otsu background removals do.
+
+    Returns (quantized BGR image, its gray version, Otsu threshold). These only
+    depend on the blur amount, so callers can cache them (see bgremove_smooth).
     """
-    import cv2
-    import numpy as np
-    
-    # สร้างสำเนาของภาพ
-    myimage = img.copy()
+    # ต้องใช้ภาพสี 3 ช่อง (ภาพเทาจะถูกขยายเป็น BGR)
+    myimage = to_bgr(img)
     
     # Blur to image to reduce noise
-    myimage = cv2.GaussianBlur(myimage, (5, 5), 0)
+    myimage = cv2.GaussianBlur(myimage, (blur_amount, blur_amount), 0)
     
-    # We bin the pixels. Result will be a value 1..5
-    bins = np.array([0, 51, 102, 153, 204, 255])
-    myimage[:, :, :] = np.digitize(myimage[:, :, :], bins, right=True) * 51
+    # We bin the pixels. Result will be a value 1..5 (times 51)
+    myimage = cv2.LUT(myimage, QUANTIZE_LUT)
     
     # Create single channel greyscale for thresholding
     myimage_grey = cv2.cvtColor(myimage, cv2.COLOR_BGR2GRAY)
     
-    # Perform Otsu thresholding and extract the background.
-    # We use Binary Threshold as we want to create an all white background
-    ret, background = cv2.threshold(myimage_grey, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    # Convert black and white back into 3 channel greyscale
-    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+    # ใช้ Otsu's method เพื่อหาค่า threshold อัตโนมัติ
+    otsu_thresh, _ = cv2.threshold(myimage_grey, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     
-    # Perform Otsu thresholding and extract the foreground.
-    # We use TOZERO_INV as we want to keep some details of the foreground
-    ret, foreground = cv2.threshold(myimage_grey, 0, 255, cv2.THRESH_TOZERO_INV + cv2.THRESH_OTSU)
+    return myimage, myimage_grey, otsu_thresh
+
+def _white_above(myimage, myimage_grey, thresh):
+    # พื้นหลัง (เทา > thresh) เป็นสีขาว ส่วนที่เหลือคงสีที่ quantize แล้วไว้
+    # เท่ากับการรวม background (THRESH_BINARY) กับ foreground ที่ mask ด้วย THRESH_*_INV
+    _, background = cv2.threshold(myimage_grey, thresh, 255, cv2.THRESH_BINARY)
+    return cv2.max(myimage, cv2.cvtColor(background, cv2.COLOR_GRAY2BGR))
+
+def bgremove1(img):
+    """
+    ลบพื้นหลังโดยใช้ Otsu Thresholding
     
-    # Currently foreground is only a mask
-    foreground = cv2.bitwise_and(myimage, myimage, mask=foreground)
+    Parameters:
+    - img: ภาพต้นฉบับ (BGR)
     
-    # Combine the background and foreground to obtain our final image
-    finalimage = background + foreground
+    Returns:
+    - finalimage: ภาพที่ลบพื้นหลังแล้ว
+    """
+    # หาค่า Otsu ครั้งเดียว แล้วใช้ค่าเดียวกันทั้ง background และ foreground
+    myimage, myimage_grey, otsu_thresh = otsu_intermediates(img, 5)
     
-    return finalimage
+    return _white_above(myimage, myimage_grey, otsu_thresh)
 
-def bgremove_smooth(img, blur_amount=5, threshold_offset=0):
+def bgremove_smooth(img, blur_amount=5, threshold_offset=0, cache=None):
     """
     ลบพื้นหลังโดยใช้ Otsu Thresholding พร้อมปรับความเรียบและค่า threshold
     
@@ -264,16 +328,12 @@ def bgremove_smooth(img, blur_amount=5, threshold_offset=0):
     - img: ภาพต้นฉบับ (BGR)
     - blur_amount: ความแรงของการเบลอ (odd value >= 3)
     - threshold_offset: ค่าชดเชย threshold (-50 to +50)
+    - cache: dict (ต่อภาพหนึ่งภาพ) เก็บผลของ otsu_intermediates ตาม blur_amount
+      ไม่เกิน OTSU_CACHE_SIZE รายการล่าสุด เมื่อเลื่อนแค่ threshold จะไม่ต้อง blur และ quantize ใหม่
     
     Returns:
     - finalimage: ภาพที่ลบพื้นหลังแล้ว
     """
-    import cv2
-    import numpy as np
-    
-    # สร้างสำเนาของภาพ
-    myimage = img.copy()
-    
     # ตรวจสอบว่า blur_amount เป็นเลขคี่
     if blur_amount % 2 == 0:
         blur_amount += 1
@@ -281,64 +341,39 @@ def bgremove_smooth(img, blur_amount=5, threshold_offset=0):
     if blur_amount < 3:
         blur_amount = 3
     
-    # Blur to image to reduce noise
-    myimage = cv2.GaussianBlur(myimage, (blur_amount, blur_amount), 0)
-    
-    # We bin the pixels. Result will be a value 1..5
-    bins = np.array([0, 51, 102, 153, 204, 255])
-    myimage[:, :, :] = np.digitize(myimage[:, :, :], bins, right=True) * 51
-    
-    # Create single channel greyscale for thresholding
-    myimage_grey = cv2.cvtColor(myimage, cv2.COLOR_BGR2GRAY)
-    
-    # ใช้ Otsu's method เพื่อหาค่า threshold อัตโนมัติ
-    otsu_thresh, _ = cv2.threshold(myimage_grey, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cache is None:
+        cache = {}
+    if blur_amount not in cache:
+        if len(cache) >= OTSU_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[blur_amount] = otsu_intermediates(img, blur_amount)
+    myimage, myimage_grey, otsu_thresh = cache[blur_amount]
     
     # ปรับค่า threshold ด้วย offset
     adjusted_thresh = otsu_thresh + threshold_offset
     adjusted_thresh = max(0, min(255, adjusted_thresh))
     
-    # ใช้ค่า threshold ที่ปรับแล้วกับภาพเทา
-    _, background = cv2.threshold(myimage_grey, adjusted_thresh, 255, cv2.THRESH_BINARY)
-    
-    # Convert black and white back into 3 channel greyscale
-    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
-    
-    # ใช้ค่า threshold ที่ปรับแล้วกับภาพเทา (สำหรับ foreground)
-    _, foreground_mask = cv2.threshold(myimage_grey, adjusted_thresh, 255, cv2.THRESH_BINARY_INV)
-    
-    # Currently foreground is only a mask
-    foreground = cv2.bitwise_and(myimage, myimage, mask=foreground_mask)
-    
-    # Combine the background and foreground to obtain our final image
-    finalimage = background + foreground
-    
-    return finalimage
+    return _white_above(myimage, myimage_grey, adjusted_thresh)
 
-def bgremove_grabcut(img, iterations=5):
-    # สร้างสำเนาของภาพ
-    img_copy = img.copy()
-    
-    # ดึงขนาดภาพ
-    height, width = img.shape[:2]
-    
-    # สร้างหน้ากากเริ่มต้น
-    mask = np.zeros(img.shape[:2], np.uint8)
-    
-    # กำหนดพารามิเตอร์สำหรับ grabCut
-    bgd_model = np.zeros((1, 65), np.float64)
-    fgd_model = np.zeros((1, 65), np.float64)
-    
-    # กำหนดสี่เหลี่ยมที่น่าจะมีวัตถุอยู่ (เลือกบริเวณตรงกลางภาพ)
-    margin = int(min(width, height) * 0.1)  # ขอบของสี่เหลี่ยม
-    rect = (margin, margin, width - margin * 2, height - margin * 2)
-    
-    # ดำเนินการ grabCut
-    cv2.grabCut(img_copy, mask, rect, bgd_model, fgd_model, iterations, cv2.GC_INIT_WITH_RECT)
+def bgremove_grabcut(img, iterations=5, quality='full', rect=None, strokes=()):
+    """
+    ลบพื้นหลังด้วย GrabCut
+
+    quality: 'full' รันที่ความละเอียดเต็ม, 'fast' / 'balanced' / 'high' รันบนภาพย่อ
+    แล้ว refine เฉพาะแถบรอบขอบวัตถุ (ดู Feature_Ex.grabcut.GRABCUT_QUALITY)
+    rect / strokes: สี่เหลี่ยมและเส้นที่ผู้ใช้วาด (พิกัดภาพเต็ม) ตามที่ GrabCutSession เก็บไว้
+    """
+    from Feature_Ex.grabcut import grabcut_mask
+
+    # grabCut ต้องใช้ภาพ BGR 8-bit
+    img_copy = to_bgr(img)
     
-    # แปลงค่าในหน้ากาก
-    mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+    mask2 = grabcut_mask(img_copy, iterations, quality, rect, strokes)
     
+    return white_background(img_copy, mask2)
+
+def white_background(img_copy, mask2):
+    """Keep the pixels where mask2 == 1 and make the rest white (img_copy is BGR)."""
     # สร้างหน้ากากสำหรับพื้นหลัง
     bg_mask = 1 - mask2
     
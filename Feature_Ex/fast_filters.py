@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+# Guided filter (He et al.) ใช้แค่ box filter จึงเป็น O(N) ไม่ขึ้นกับ radius
+
+def _box(img, radius):
+    return cv2.boxFilter(img, cv2.CV_32F, (2 * radius + 1, 2 * radius + 1),
+                         borderType=cv2.BORDER_REFLECT)
+
+def _guided_coefficients(guide, src, radius, eps):
+    mean_i = _box(guide, radius)
+    mean_p = _box(src, radius)
+    var_i = _box(guide * guide, radius) - mean_i * mean_i
+    cov_ip = _box(guide * src, radius) - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return _box(a, radius), _box(b, radius)
+
+def guided_filter(guide, src, radius=8, eps=1e-3):
+    """
+    Edge-preserving smoothing of src following the edges of a single-channel guide.
+
+    guide and src are float32 images in 0..1 with the same size.
+    """
+    mean_a, mean_b = _guided_coefficients(guide, src, radius, eps)
+    return mean_a * guide + mean_b
+
+def guided_upsample(guide, src_small, radius=4, eps=1e-3):
+    """
+    Upsample a low-resolution map (e.g. a mask) to the size of guide so its
+    edges snap to the edges of the full-resolution guide.
+
+    This is the fast guided filter: the linear coefficients are fitted at the
+    low resolution and only they are upsampled, so the cost at full
+    resolution is one resize and one multiply-add.
+    """
+    height, width = guide.shape[:2]
+    small_h, small_w = src_small.shape[:2]
+    guide_small = cv2.resize(guide, (small_w, small_h), interpolation=cv2.INTER_AREA)
+
+    mean_a, mean_b = _guided_coefficients(guide_small, src_small.astype(np.float32), radius, eps)
+    mean_a = cv2.resize(mean_a, (width, height), interpolation=cv2.INTER_LINEAR)
+    mean_b = cv2.resize(mean_b, (width, height), interpolation=cv2.INTER_LINEAR)
+    return mean_a * guide + mean_b
@@ -0,0 +1,250 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from Feature_Ex.channels import to_bgr
+from Feature_Ex.fast_filters import guided_upsample
+
+# ระดับคุณภาพ: ขนาดด้านยาวของภาพย่อที่ใช้รัน GrabCut, ความกว้างแถบขอบ (px ที่ความละเอียดเต็ม)
+# ที่จะรัน GrabCut ซ้ำ และจำนวนรอบของการ refine ในแถบนั้น ('full' = รันที่ความละเอียดเต็มแบบเดิม)
+GRABCUT_QUALITY = {
+    'fast': {'proxy_size': 512, 'band': 0, 'refine_iterations': 0},
+    'balanced': {'proxy_size': 800, 'band': 6, 'refine_iterations': 2},
+    'high': {'proxy_size': 1280, 'band': 12, 'refine_iterations': 3},
+    'full': None,
+}
+
+REFINE_TILE_SIZE = 512
+
+# จำนวนรอบที่ใช้หลังจากผู้ใช้ระบายแก้ foreground/background
+STROKE_ITERATIONS = 2
+
+def default_rect(width, height):
+    """The rectangle bgremove_grabcut has always used: the image minus a 10% margin."""
+    margin = int(min(width, height) * 0.1)  # ขอบของสี่เหลี่ยม
+    return (margin, margin, width - margin * 2, height - margin * 2)
+
+def _foreground(mask):
+    return ((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD)).astype(np.uint8)
+
+def _refine_band(img, fg, prob, band, iterations, workers=None):
+    """
+    Re-run GrabCut at full resolution only near the boundary of fg.
+
+    Pixels further than `band` px from the boundary are fixed (GC_FGD /
+    GC_BGD); inside the band the upsampled probability gives the initial
+    PR_FGD / PR_BGD labels. Only tiles that contain band pixels are processed,
+    each with some context around it, and they run in parallel.
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * band + 1, 2 * band + 1))
+    uncertain = cv2.dilate(fg, kernel) != cv2.erode(fg, kernel)
+
+    labels = np.where(fg > 0, cv2.GC_FGD, cv2.GC_BGD).astype(np.uint8)
+    labels[uncertain] = np.where(prob[uncertain] >= 0.5, cv2.GC_PR_FGD, cv2.GC_PR_BGD)
+
+    height, width = fg.shape
+    context = 2 * band
+    out = fg.copy()
+
+    def refine(region):
+        ys, xs = region
+        if not uncertain[ys, xs].any():
+            return
+        y0, y1 = max(ys.start - context, 0), min(ys.stop + context, height)
+        x0, x1 = max(xs.start - context, 0), min(xs.stop + context, width)
+        tile_labels = labels[y0:y1, x0:x1].copy()
+        bgd_model = np.zeros((1, 65), np.float64)
+        fgd_model = np.zeros((1, 65), np.float64)
+        try:
+            cv2.grabCut(img[y0:y1, x0:x1], tile_labels, None, bgd_model, fgd_model,
+                        iterations, cv2.GC_INIT_WITH_MASK)
+        except cv2.error:
+            # tile ที่ไม่มีตัวอย่างทั้ง foreground และ background ใช้ผลจากภาพย่อไป
+            return
+        out[ys, xs] = _foreground(tile_labels)[ys.start - y0:ys.stop - y0, xs.start - x0:xs.stop - x0]
+
+    regions = [(slice(y, min(y + REFINE_TILE_SIZE, height)), slice(x, min(x + REFINE_TILE_SIZE, width)))
+               for y in range(0, height, REFINE_TILE_SIZE) for x in range(0, width, REFINE_TILE_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        list(pool.map(refine, regions))
+
+    return out
+
+class GrabCutSession:
+    """
+    A GrabCut segmentation that keeps its mask and GMM models between calls.
+
+    The first run() initialises from the rectangle; asking for more
+    iterations later resumes with GC_EVAL, and masks for iteration counts
+    already reached are kept, so moving the Iterations slider never restarts
+    from scratch. Foreground/background strokes are written into the mask as
+    definite labels and refined with GC_INIT_WITH_MASK for STROKE_ITERATIONS.
+
+    With a quality other than 'full' GrabCut works on a downscaled proxy
+    (see GRABCUT_QUALITY) and foreground_mask() brings the result back to
+    full resolution. All coordinates are in full-resolution image pixels.
+
+    set_rect() and add_stroke() only record the edit, so the UI thread never
+    waits for a run() in progress on a worker thread; the edit is applied by
+    the next run().
+    """
+
+    def __init__(self, img, quality='full', rect=None):
+        self.img = to_bgr(img)
+        self.quality = quality
+        self.settings = GRABCUT_QUALITY[quality]
+
+        height, width = self.img.shape[:2]
+        self.scale = 1.0
+        if self.settings:
+            self.scale = min(self.settings['proxy_size'] / max(width, height), 1.0)
+        if self.scale < 1.0:
+            size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+            self.work = cv2.resize(self.img, size, interpolation=cv2.INTER_AREA)
+        else:
+            self.work = self.img
+
+        self.rect = rect or default_rect(width, height)
+        self.strokes = []   # (points, foreground, radius) ตามลำดับที่วาด
+        self.version = 0    # เพิ่มทุกครั้งที่ผู้ใช้แก้ rect หรือวาดเส้น
+
+        self._lock = threading.RLock()        # สถานะของการ segment (mask, model)
+        self._edit_lock = threading.Lock()    # การแก้ไขที่รอ run() ถัดไป
+        self._restart = True
+        self._pending = []
+        self._reset()
+
+    def _reset(self):
+        self.mask = None
+        self.bgd_model = np.zeros((1, 65), np.float64)
+        self.fgd_model = np.zeros((1, 65), np.float64)
+        self.iterations = 0
+        self._snapshots = {}
+        self._full_mask = None
+
+    def set_rect(self, rect):
+        """Start over from a new rectangle (x, y, w, h); earlier strokes are dropped."""
+        with self._edit_lock:
+            self.rect = tuple(int(v) for v in rect)
+            self.strokes = []
+            self._pending = []
+            self._restart = True
+            self.version += 1
+
+    def add_stroke(self, points, foreground, radius=5):
+        """Mark the pixels along points [(x, y), ...] as definite foreground or background."""
+        stroke = ([(int(x), int(y)) for x, y in points], bool(foreground), radius)
+        with self._edit_lock:
+            self.strokes.append(stroke)
+            self._pending.append(stroke)
+            self.version += 1
+
+    def copy_edits_from(self, other):
+        """Take over the rectangle and strokes of another session (e.g. after a quality change)."""
+        with other._edit_lock:
+            rect, strokes = other.rect, list(other.strokes)
+        with self._edit_lock:
+            self.rect = rect
+            self.strokes = strokes
+            self._pending = list(strokes)
+            self._restart = True
+            self.version += 1
+
+    def _draw_stroke(self, stroke):
+        points, foreground, radius = stroke
+        label = cv2.GC_FGD if foreground else cv2.GC_BGD
+        pts = np.round(np.array(points, np.float64) * self.scale).astype(np.int32)
+        thickness = max(1, round(radius * self.scale))
+        if len(pts) == 1:
+            cv2.circle(self.mask, tuple(int(v) for v in pts[0]), thickness, label, -1)
+        else:
+            cv2.polylines(self.mask, [pts.reshape(-1, 1, 2)], False, label, 2 * thickness)
+
+    def _grabcut(self, rect, iterations, mode):
+        cv2.grabCut(self.work, self.mask, rect, self.bgd_model, self.fgd_model, iterations, mode)
+        self._full_mask = None
+
+    def _snapshot(self):
+        self._snapshots[self.iterations] = (self.mask.copy(), self.bgd_model.copy(), self.fgd_model.copy())
+
+    def run(self, iterations):
+        """Bring the segmentation to `iterations` iterations, doing only the work not done yet."""
+        with self._lock:
+            with self._edit_lock:
+                restart, self._restart = self._restart, False
+                pending, self._pending = self._pending, []
+                rect = self.rect
+
+            if restart:
+                self._reset()
+
+            if self.mask is None:
+                x, y, w, h = rect
+                rect = (int(x * self.scale), int(y * self.scale),
+                        max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+                self.mask = np.zeros(self.work.shape[:2], np.uint8)
+                self._grabcut(rect, iterations, cv2.GC_INIT_WITH_RECT)
+                self.iterations = iterations
+                self._snapshot()
+
+            if pending:
+                for stroke in pending:
+                    self._draw_stroke(stroke)
+                self._grabcut(None, STROKE_ITERATIONS, cv2.GC_INIT_WITH_MASK)
+                # masks ที่เก็บไว้ก่อนหน้าไม่มีเส้นที่เพิ่งวาด
+                self._snapshots = {}
+                self.iterations = iterations
+                self._snapshot()
+            elif iterations in self._snapshots:
+                mask, bgd_model, fgd_model = self._snapshots[iterations]
+                self.mask, self.bgd_model, self.fgd_model = mask.copy(), bgd_model.copy(), fgd_model.copy()
+                self.iterations = iterations
+                self._full_mask = None
+            elif iterations > self.iterations:
+                self._grabcut(None, iterations - self.iterations, cv2.GC_EVAL)
+                self.iterations = iterations
+                self._snapshot()
+            # ลดจำนวนรอบหลังจากแก้ด้วยเส้นแล้ว: ใช้ mask ปัจจุบันต่อ
+
+    def foreground_mask(self):
+        """Full-resolution uint8 mask, 1 = foreground."""
+        with self._lock:
+            if self.mask is None:
+                raise RuntimeError("run() has not been called")
+            if self._full_mask is not None:
+                return self._full_mask
+
+            fg = _foreground(self.mask)
+            if self.work is not self.img:
+                # ขยาย mask แบบ edge-aware โดยใช้ภาพเทาความละเอียดเต็มเป็น guide
+                guide = cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+                prob = guided_upsample(guide, fg.astype(np.float32), radius=2, eps=1e-3)
+                fg = (prob >= 0.5).astype(np.uint8)
+                if self.settings['band'] > 0 and self.settings['refine_iterations'] > 0:
+                    fg = _refine_band(self.img, fg, prob, self.settings['band'],
+                                      self.settings['refine_iterations'])
+
+            self._full_mask = fg
+            return fg
+
+def grabcut_mask(img, iterations=5, quality='full', rect=None, strokes=()):
+    """
+    Return the GrabCut foreground mask (uint8, 1 = foreground) of a BGR image.
+
+    With quality 'full' GrabCut runs on the full-resolution image. The other
+    levels (see GRABCUT_QUALITY) run it on a downscaled proxy, upsample the
+    mask with a guided filter so it follows the full-resolution edges, and
+    then re-run GrabCut only in a narrow band around the object boundary.
+
+    strokes are GrabCutSession.strokes, (points, foreground, radius); they
+    are applied one at a time after the first run, as they were drawn.
+    """
+    session = GrabCutSession(img, quality, rect)
+    session.run(iterations)
+    for points, foreground, radius in strokes:
+        session.add_stroke(points, foreground, radius)
+        session.run(iterations)
+    return session.foreground_mask()
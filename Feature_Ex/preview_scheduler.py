@@ -0,0 +1,113 @@
+import threading
+import traceback
+
+class PreviewScheduler:
+    """
+    Run preview renders on a background thread and show only the latest one.
+
+    render_fn(*args) runs on the worker thread and must not touch Tk widgets;
+    it should return something cheap to display (e.g. a PIL image sized for the
+    canvas). display_fn(result) runs on the Tk thread via widget.after().
+    A long render can check cancelled() between stages and return None once
+    it has been superseded; None is not displayed.
+
+    request() may be called on every slider tick: requests that arrive while a
+    render is running replace each other, so only the newest slider state is
+    rendered next and intermediate states are never computed.
+    """
+
+    def __init__(self, widget, render_fn, display_fn, poll_ms=15):
+        self.widget = widget
+        self.render_fn = render_fn
+        self.display_fn = display_fn
+        self.poll_ms = poll_ms
+
+        self._cond = threading.Condition()
+        self._pending = None      # (generation, args) ที่ยังไม่ได้เริ่ม render
+        self._generation = 0      # เลขของ request ล่าสุด
+        self._result = None       # (generation, result, error) ที่รอแสดงผล
+        self._busy = False
+        self._closed = False
+        self._polling = False
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+        widget.bind('<Destroy>', self._on_destroy, add='+')
+
+    def request(self, *args):
+        """Schedule a render with the given arguments, superseding older requests."""
+        with self._cond:
+            if self._closed:
+                return
+            self._generation += 1
+            self._pending = (self._generation, args)
+            self._cond.notify()
+        self._start_polling()
+
+    def cancelled(self):
+        """True when a newer request exists; long renders may check this and bail out early."""
+        with self._cond:
+            return self._pending is not None or self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget:
+            self.close()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                generation, args = self._pending
+                self._pending = None
+                self._busy = True
+
+            result, error = None, None
+            try:
+                result = self.render_fn(*args)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._busy = False
+                # renders run one at a time, so this is always the newest finished
+                # result; it replaces any result the Tk thread has not shown yet
+                self._result = (generation, result, error)
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        with self._cond:
+            ready = self._result
+            self._result = None
+            working = self._busy or self._pending is not None
+            closed = self._closed
+
+        if closed:
+            self._polling = False
+            return
+
+        # แสดงผลล่าสุดที่ render เสร็จ ระหว่างลาก slider จึงยังเห็นภาพเปลี่ยนตาม
+        if ready is not None:
+            _, result, error = ready
+            if error is not None:
+                traceback.print_exception(type(error), error, error.__traceback__)
+            elif result is not None:
+                self.display_fn(result)
+
+        if working:
+            self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,89 @@
+import math
+
+import cv2
+import numpy as np
+
+from Feature_Ex.channels import to_gray
+
+THRESHOLD_METHODS = ("Gaussian", "Mean", "Sauvola", "Niblack")
+
+# ช่วงของ standard deviation ที่ใช้ใน Sauvola (ภาพ 8-bit)
+SAUVOLA_R = 128.0
+
+class ThresholdEngine:
+    """
+    Local (adaptive) thresholding of one gray image.
+
+    The integral image and integral of squares are computed once (on an
+    edge-replicated copy, like cv2.adaptiveThreshold's border handling), so
+    the local mean and standard deviation for any block size cost O(1) per
+    pixel. 'Mean' gives the same result as cv2.adaptiveThreshold with
+    ADAPTIVE_THRESH_MEAN_C; 'Gaussian' still uses cv2.adaptiveThreshold.
+
+    The Adjust value c is the constant subtracted from the mean for
+    Gaussian/Mean, and k * 10 for Sauvola (k = c / 10) and Niblack (k = -c / 10).
+    """
+
+    def __init__(self, gray):
+        self.gray = gray
+        self._pad = 0
+        self._sum = None
+        self._sqsum = None
+
+    def _integrals(self, radius, squares):
+        if self._sum is None or radius > self._pad or (squares and self._sqsum is None):
+            pad = max(radius, self._pad)
+            padded = cv2.copyMakeBorder(self.gray, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+            if squares:
+                self._sum, self._sqsum = cv2.integral2(padded, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+            else:
+                self._sum = cv2.integral(padded, sdepth=cv2.CV_64F)
+                self._sqsum = None
+            self._pad = pad
+        return self._sum, self._sqsum
+
+    def _window_sum(self, integral, radius):
+        height, width = self.gray.shape
+        lo = self._pad - radius
+        hi = self._pad + radius + 1
+        return (integral[hi:hi + height, hi:hi + width] - integral[lo:lo + height, hi:hi + width]
+                - integral[hi:hi + height, lo:lo + width] + integral[lo:lo + height, lo:lo + width])
+
+    def local_stats(self, block_size, std=False):
+        """Local mean (and standard deviation) over block_size x block_size windows, as float64."""
+        radius = block_size // 2
+        integral, integral_sq = self._integrals(radius, std)
+        scale = 1.0 / (block_size * block_size)
+        mean = self._window_sum(integral, radius) * scale
+        if not std:
+            return mean, None
+        variance = self._window_sum(integral_sq, radius) * scale - mean * mean
+        return mean, np.sqrt(np.maximum(variance, 0, out=variance), out=variance)
+
+    def threshold(self, method, block_size, c):
+        """Return the binary image (uint8, 0/255) for one of THRESHOLD_METHODS."""
+        if block_size % 2 == 0:
+            block_size += 1
+
+        if method == "Gaussian":
+            return cv2.adaptiveThreshold(self.gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                         cv2.THRESH_BINARY, block_size, c)
+
+        if method == "Mean":
+            # ปัดค่าเฉลี่ยเป็นจำนวนเต็มเหมือน boxFilter 8-bit ใน cv2.adaptiveThreshold
+            mean, _ = self.local_stats(block_size)
+            thresh = np.rint(mean, out=mean) - math.ceil(c)
+        elif method == "Sauvola":
+            mean, std = self.local_stats(block_size, std=True)
+            thresh = mean * (1 + (c / 10.0) * (std / SAUVOLA_R - 1))
+        elif method == "Niblack":
+            mean, std = self.local_stats(block_size, std=True)
+            thresh = mean - (c / 10.0) * std
+        else:
+            raise ValueError(f"Unknown threshold method: {method}")
+
+        return np.where(self.gray > thresh, np.uint8(255), np.uint8(0))
+
+def adaptive_threshold(img, method="Gaussian", block_size=11, c=2):
+    """One-shot local threshold of a gray or colour image (see ThresholdEngine)."""
+    return ThresholdEngine(to_gray(img)).threshold(method, block_size, c)
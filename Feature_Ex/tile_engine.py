@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from Feature_Ex.cv_pro import adjust_hsv, value_histogram
+
+# ขนาด tile และจำนวนพิกเซลขั้นต่ำที่จะเริ่มประมวลผลแบบ tile
+# TILE_SIZE ควรเป็นพหุคูณของ 32: cvtColor ปัดเศษส่วนท้ายแถว (ที่ไม่ใช้ SIMD) ต่างออกไปเล็กน้อย
+# ถ้าไม่ใช่ ผลตามขอบ tile จะต่างจากการประมวลผลทั้งภาพ ±1
+TILE_SIZE = 1024
+TILED_MIN_PIXELS = 16 * 1024 * 1024
+
+def iter_tiles(height, width, tile_size=TILE_SIZE):
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield (slice(y, min(y + tile_size, height)), slice(x, min(x + tile_size, width)))
+
+def _default_workers():
+    return os.cpu_count() or 1
+
+def map_tiles(img, func, tile_size=TILE_SIZE, workers=None):
+    """Call func(tile) for every tile on a thread pool and return the results in tile order."""
+    tiles = list(iter_tiles(img.shape[0], img.shape[1], tile_size))
+    with ThreadPoolExecutor(max_workers=workers or _default_workers()) as pool:
+        return list(pool.map(lambda region: func(img[region]), tiles))
+
+def process_tiled(img, func, tile_size=TILE_SIZE, workers=None, out=None):
+    """
+    Apply a pointwise func(tile) -> tile over fixed-size tiles on a thread pool.
+
+    The result is written straight into `out` (allocated like img when not
+    given), so peak memory is the output plus the temporaries of one tile per
+    worker instead of several full-frame float copies.
+    """
+    if out is None:
+        out = np.empty_like(img)
+
+    def run(region):
+        out[region] = func(img[region])
+
+    tiles = list(iter_tiles(img.shape[0], img.shape[1], tile_size))
+    with ThreadPoolExecutor(max_workers=workers or _default_workers()) as pool:
+        # list() เพื่อให้ exception จาก worker ถูกส่งต่อออกมา
+        list(pool.map(run, tiles))
+
+    return out
+
+def _value_plane(tile):
+    # ภาพ 8-bit: V = max(B, G, R)
+    if tile.ndim == 3 and tile.shape[2] > 1:
+        return np.maximum(np.maximum(tile[..., 0], tile[..., 1]), tile[..., 2])
+    return tile
+
+def value_histogram_tiled(img, tile_size=TILE_SIZE, workers=None):
+    """256-bin histogram of the HSV value channel, computed tile by tile."""
+    hists = map_tiles(img, lambda tile: value_histogram(_value_plane(tile)), tile_size, workers)
+    return np.sum(hists, axis=0)
+
+def adjust_hsv_tiled(img, params, tile_size=TILE_SIZE, workers=None):
+    """Run adjust_hsv over tiles with the V histogram of the whole image."""
+    if params.get('highlights') or params.get('shadows'):
+        params = dict(params, v_hist=value_histogram_tiled(img, tile_size, workers))
+
+    out = None
+    if img.ndim == 3 and img.shape[2] == 4:
+        # adjust_hsv คืนภาพ BGR 3 ช่องเหมือน adjust_* ตัวอื่น
+        out = np.empty(img.shape[:2] + (3,), np.uint8)
+    return process_tiled(img, lambda tile: adjust_hsv(tile, **params), tile_size, workers, out)
@@ -0,0 +1,217 @@
+"""
+Scan pages from a video: find the document once, then follow its corners.
+
+    python -m More_Function.document_tracker pages.mp4 --output scanned/
+
+The outline is detected with find_document_quad (Canny + contours) only
+when there is no quad yet or tracking is lost. In between, the four corners
+are followed with pyramidal Lucas-Kanade optical flow on the small detection
+image and snapped back onto the corners with cornerSubPix. When the corners
+and the page content have been still for a number of frames, the page is
+rectified at full resolution and emitted. It is emitted again only after
+the page has moved, left the frame or been covered (e.g. by the hand
+turning it), so camera shake does not produce duplicates.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from Feature_Ex.channels import to_gray
+from More_Function.document_scanner import (
+    find_document_quad, detection_gray, contour_to_rect, binarize_page,
+    MIN_QUAD_AREA, SUBPIX_CRITERIA,
+)
+
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+# ระยะ forward-backward (px ในภาพย่อ) ที่ยังถือว่าติดตามมุมได้ถูกต้อง
+MAX_FB_ERROR = 1.0
+# พื้นที่ของสี่เหลี่ยมเปลี่ยนได้ไม่เกินสัดส่วนนี้ต่อเฟรม ถ้าเกินถือว่าหลุด
+MAX_AREA_CHANGE = 0.2
+
+# มุมขยับน้อยกว่านี้ (px ในภาพย่อ) ถือว่านิ่ง; ต้องนิ่งติดกัน STABLE_FRAMES เฟรมจึงส่งหน้าออก
+STILL_THRESHOLD = 1.0
+STABLE_FRAMES = 8
+# มุมห่างจากตำแหน่งตอนส่งหน้าออกเกินนี้ (px ในภาพย่อ) ถือว่าเป็นหน้าใหม่
+MOVE_THRESHOLD = 4.0
+
+# ภาพย่อของหน้า ใช้ตรวจว่ามีอะไรผ่านหน้าเอกสาร (มือพลิกหน้า) ระหว่างสองเฟรม
+THUMB_SIZE = 64
+CONTENT_CHANGE = 8.0
+
+class DocumentTracker:
+    """
+    Streaming document scanner. Feed frames to update(); it returns a
+    rectified binary page (like scan_document) once a page has been still
+    for stable_frames frames, and None otherwise.
+
+    corners holds the current quad in full-resolution pixels (or None) and
+    stats counts frames, detections, tracked frames and emitted pages.
+    """
+
+    def __init__(self, resize_height=500, stable_frames=STABLE_FRAMES,
+                 still_threshold=STILL_THRESHOLD, block_size=11, c=7):
+        self.resize_height = resize_height
+        self.stable_frames = stable_frames
+        self.still_threshold = still_threshold
+        self.block_size = block_size
+        self.c = c
+        self.stats = {'frames': 0, 'detections': 0, 'tracked': 0, 'pages': 0}
+        self.reset()
+
+    def reset(self):
+        """Forget the current quad and page, e.g. when a new video starts."""
+        self._prev_gray = None
+        self._quad = None          # มุมในภาพย่อ (4, 1, 2) float32
+        self._still = 0
+        self._thumb = None         # ภาพย่อของหน้าในเฟรมก่อน
+        self._emitted_quad = None  # มุมของหน้าที่ส่งออกไปล่าสุด (None = ยังไม่ได้ส่งหน้าปัจจุบัน)
+        self.corners = None
+
+    def _track(self, gray):
+        """Follow the previous quad into gray; None when the result is not trustworthy."""
+        quad, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._quad, None, **LK_PARAMS)
+        if quad is None or not status.all():
+            return None
+        back, status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, quad, None, **LK_PARAMS)
+        if back is None or not status.all():
+            return None
+        if np.abs(back - self._quad).max() > MAX_FB_ERROR:
+            return None
+
+        if not cv2.isContourConvex(quad.astype(np.int32)):
+            return None
+        area = cv2.contourArea(quad)
+        if area < MIN_QUAD_AREA * gray.size:
+            return None
+        if abs(area / cv2.contourArea(self._quad) - 1.0) > MAX_AREA_CHANGE:
+            return None
+
+        cv2.cornerSubPix(gray, quad, (5, 5), (-1, -1), SUBPIX_CRITERIA)
+        return quad
+
+    def _page_thumb(self, gray, quad):
+        src = contour_to_rect(quad, 1.0)
+        dst = np.array([[0, 0], [THUMB_SIZE - 1, 0], [THUMB_SIZE - 1, THUMB_SIZE - 1], [0, THUMB_SIZE - 1]],
+                       dtype=np.float32)
+        M = cv2.getPerspectiveTransform(src, dst)
+        return cv2.warpPerspective(gray, M, (THUMB_SIZE, THUMB_SIZE))
+
+    @staticmethod
+    def _thumb_diff(a, b):
+        return cv2.norm(a, b, cv2.NORM_L1) / a.size
+
+    def update(self, frame):
+        """Process one frame; return the scanned page when a new page has become stable."""
+        self.stats['frames'] += 1
+        full_gray = to_gray(frame)
+        gray, ratio = detection_gray(full_gray, self.resize_height)
+
+        quad = None
+        if self._quad is not None and gray.shape == self._prev_gray.shape:
+            quad = self._track(gray)
+        if quad is not None:
+            self.stats['tracked'] += 1
+            motion = np.abs(quad - self._quad).max()
+        else:
+            # ยังไม่มีหรือติดตามไม่ได้: หาใหม่ทั้งเฟรม
+            quad = find_document_quad(gray)
+            self.stats['detections'] += 1
+            motion = np.inf
+
+        self._prev_gray = gray
+        if quad is None:
+            self.reset()
+            self._prev_gray = gray
+            return None
+
+        self._quad = quad
+        self.corners = contour_to_rect(quad, ratio)
+
+        thumb = self._page_thumb(gray, quad)
+        covered = self._thumb is not None and self._thumb_diff(thumb, self._thumb) >= CONTENT_CHANGE
+        if self._emitted_quad is not None and (covered or np.abs(quad - self._emitted_quad).max() >= MOVE_THRESHOLD):
+            self._emitted_quad = None
+        if motion < self.still_threshold and not covered:
+            self._still += 1
+        else:
+            self._still = 0
+        self._thumb = thumb
+
+        if self._still + 1 < self.stable_frames or self._emitted_quad is not None:
+            return None
+
+        self._emitted_quad = quad
+        self.stats['pages'] += 1
+        return binarize_page(full_gray, self.corners, self.block_size, self.c)
+
+def scan_pages(frames, tracker=None, **kwargs):
+    """
+    Yield (frame_index, page) for every stable page in an iterable of frames.
+
+    Pass a DocumentTracker to read its stats afterwards; otherwise one is
+    created from kwargs.
+    """
+    if tracker is None:
+        tracker = DocumentTracker(**kwargs)
+    for index, frame in enumerate(frames):
+        page = tracker.update(frame)
+        if page is not None:
+            yield index, page
+
+def scan_video(path, output_dir, on_page=None, **kwargs):
+    """
+    Write every stable page of the video at path to output_dir as page_001.png, ...
+
+    on_page(index, page) is called for every page. Returns the tracker stats
+    plus seconds and fps.
+    """
+    from Batch.video_process import open_frames
+
+    frames, _ = open_frames(path)
+    os.makedirs(output_dir, exist_ok=True)
+    tracker = DocumentTracker(**kwargs)
+    start = time.perf_counter()
+    for index, page in scan_pages((frame for frame, _ in frames), tracker):
+        out_path = os.path.join(output_dir, f"page_{tracker.stats['pages']:03d}.png")
+        if not cv2.imwrite(out_path, page):
+            raise OSError(f"unable to write {out_path}")
+        if on_page:
+            on_page(index, page)
+
+    stats = dict(tracker.stats)
+    stats['seconds'] = time.perf_counter() - start
+    stats['fps'] = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan every page shown in a video of documents.")
+    parser.add_argument('input', help="Video file or animated GIF")
+    parser.add_argument('--output', required=True, help="Folder for page_001.png, page_002.png, ...")
+    parser.add_argument('--stable-frames', type=int, default=STABLE_FRAMES,
+                        help="Frames a page must stay still before it is scanned")
+    parser.add_argument('--block-size', type=int, default=11)
+    parser.add_argument('--c', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    def on_page(index, page):
+        print(f"page at frame {index}: {page.shape[1]}x{page.shape[0]}")
+
+    try:
+        stats = scan_video(args.input, args.output, on_page, stable_frames=args.stable_frames,
+                           block_size=args.block_size, c=args.c)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{stats['pages']} page(s) from {stats['frames']} frame(s) in {stats['seconds']:.2f} s "
+          f"({stats['fps']:.1f} fps, {stats['detections']} full detection(s))")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
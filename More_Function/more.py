@@ -1,8 +1,12 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, StringVar
+import threading
+from tkinter import ttk, messagebox, filedialog, StringVar
 from PIL import Image, ImageTk
 from .morecv import *
 from .document_scanner import scan_document
+from .document_tracker import scan_video
+from Feature_Ex.channels import to_pil_image
+from Feature_Ex.preview_scheduler import PreviewScheduler
 import cv2
 import numpy as np
 
@@ -12,9 +16,14 @@ def open_more_window(parent, img, callback):
     more_window.geometry("1000x700")
     more_window.minsize(800, 600)
     
-    current_img = img.copy()
+    # ภาพที่ได้รับเป็นแบบอ่านอย่างเดียว ทุกฟังก์ชันคืนภาพใหม่ จึงใช้ร่วมกันได้โดยไม่ต้อง copy
+    current_img = img
+    # ขั้นตอนที่สร้าง current_img (label, op, params) ส่งให้หน้าหลักคำนวณใหม่ได้; None = คำนวณซ้ำไม่ได้
+    current_step = None
     current_preview = {'img_pil': None}
-    original_img = img.copy()
+    original_img = img
+    # palette ที่ fit แล้วของภาพนี้ (ตามจำนวนสี) ใช้ซ้ำเมื่อเปลี่ยน Pixel Size
+    palette_cache = {}
 
     left_frame = tk.Frame(more_window, padx=10, pady=10)
     left_frame.pack(side="left", fill="y")
@@ -38,10 +47,7 @@ def open_more_window(parent, img, callback):
     notebook.add(sketch_tab, text="Sketch")
     notebook.add(document_tab, text="Document Scanner")
 
-    def update_preview(processed_img):
-        img_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
-        current_preview['img_pil'] = Image.fromarray(img_rgb)
-        
+    def canvas_size():
         canvas_width = preview_canvas.winfo_width()
         canvas_height = preview_canvas.winfo_height()
         
@@ -49,17 +55,24 @@ def open_more_window(parent, img, callback):
             canvas_width = 700
         if canvas_height <= 1:
             canvas_height = 600
-            
-        img_display = current_preview['img_pil'].copy()
-        img_display.thumbnail((canvas_width, canvas_height), Image.LANCZOS)
+        return canvas_width, canvas_height
+
+    def update_preview(processed_img):
+        current_preview['img_pil'] = to_pil_image(processed_img)
         
+        img_display = current_preview['img_pil'].copy()
+        img_display.thumbnail(canvas_size(), Image.LANCZOS)
+        draw_preview(img_display)
+
+    def draw_preview(img_display):
+        canvas_width, canvas_height = canvas_size()
         img_tk = ImageTk.PhotoImage(img_display)
         preview_canvas.delete("all")
         preview_canvas.create_image(canvas_width//2, canvas_height//2, anchor=tk.CENTER, image=img_tk)
         preview_canvas.image = img_tk
 
     def apply_pixel_art():
-        nonlocal current_img
+        nonlocal current_img, current_step
         try:
             pixel_size = int(pixel_size_var.get())
             color_levels = int(color_levels_var.get())
@@ -70,18 +83,58 @@ def open_more_window(parent, img, callback):
             pixel_size_scale.set(pixel_size)
             color_levels_scale.set(color_levels)
             
-            current_img = convert_to_pixel_art(original_img, pixel_size, color_levels)
+            mode = "kmeans" if palette_mode_var.get() == "Adaptive (k-means)" else "uniform"
+            current_img = convert_to_pixel_art(original_img, pixel_size, color_levels, mode, palette_cache)
+            current_step = ("Pixel Art", convert_to_pixel_art,
+                            {'pixel_size': pixel_size, 'color_levels': color_levels, 'mode': mode})
             update_preview(current_img)
         except ValueError:
             messagebox.showerror("Error", "Please enter valid integer values for Pixel Size and Color Levels.")
     
     def apply_cartoon():
-        nonlocal current_img
-        current_img = apply_cartoon_effect(original_img)
+        nonlocal current_img, current_step
+        quality = cartoon_quality_var.get()
+        current_img = apply_cartoon_effect(original_img, quality)
+        current_step = ("Cartoon", apply_cartoon_effect, {'quality': quality})
         update_preview(current_img)
     
+    # blur plane ของภาพนี้ตาม blur size ใช้บน worker thread ของ scheduler เท่านั้น
+    sketch_cache = {}
+
+    def render_sketch(params, size):
+        # ทำงานบน worker thread ห้ามแตะ widget ของ Tk
+        blur_size, intensity, invert = params
+        sketch = apply_sketch_effect(original_img, blur_size, intensity, invert, sketch_cache)
+        if sketch_scheduler.cancelled():
+            return None
+        
+        # ย่อภาพสำหรับแสดงผลที่นี่ด้วย ไม่ต้องทำ thumbnail ภาพเต็มบน Tk thread
+        height, width = sketch.shape[:2]
+        scale = min(size[0] / width, size[1] / height, 1.0)
+        display = sketch
+        if scale < 1.0:
+            display = cv2.resize(sketch, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                 interpolation=cv2.INTER_AREA)
+        step = ("Sketch", apply_sketch_effect, {'blur_size': blur_size, 'intensity': intensity, 'invert': invert})
+        return sketch, step, to_pil_image(display)
+
+    def show_sketch(rendered):
+        nonlocal current_img, current_step
+        # ผู้ใช้เปลี่ยนไปใช้ฟีเจอร์อื่นระหว่างที่ render อยู่ ไม่ต้องทับผลนั้น
+        if notebook.select() != str(sketch_tab):
+            return
+        current_img, current_step, img_display = rendered
+        draw_preview(img_display)
+
+    sketch_scheduler = PreviewScheduler(preview_canvas, render_sketch, show_sketch)
+
+    def request_sketch():
+        # เรียกทุกครั้งที่เลื่อน slider: เปลี่ยนแค่ intensity/invert จะใช้ blur plane เดิม
+        blur_size = int(float(sketch_blur_scale.get())) | 1
+        intensity = round(float(sketch_intensity_scale.get()), 1)
+        sketch_scheduler.request((blur_size, intensity, sketch_invert_var.get()), canvas_size())
+
     def apply_sketch():
-        nonlocal current_img
         try:
             blur_size = int(sketch_blur_var.get())
             intensity = float(sketch_intensity_var.get())
@@ -93,24 +146,74 @@ def open_more_window(parent, img, callback):
                 sketch_blur_scale.set(blur_size)
                 sketch_blur_var.set(str(blur_size))
             
-            current_img = apply_sketch_effect(original_img, blur_size, intensity, invert)
-            update_preview(current_img)
+            sketch_scheduler.request((blur_size, intensity, invert), canvas_size())
         except ValueError:
             messagebox.showerror("Error", "Please enter valid values for Blur Size and Intensity.")
     
     def apply_document_scan():
-        nonlocal current_img
+        nonlocal current_img, current_step
         try:
             # ใช้ฟังก์ชัน scan_document แบบอัตโนมัติ
             scanned = scan_document(original_img)
             if scanned is not None:
                 current_img = scanned
+                current_step = ("Scan Document", scan_document, {})
                 update_preview(current_img)
             else:
                 messagebox.showerror("Error", "Failed to scan document. No document contour found.")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def apply_video_scan():
+        # สแกนทุกหน้าจากวิดีโอลงโฟลเดอร์ (ทำใน thread แยก) แล้วแสดงหน้าล่าสุด
+        video_path = filedialog.askopenfilename(
+            parent=more_window, title="Open Video of Pages",
+            filetypes=[("Video / GIF", "*.mp4 *.avi *.mov *.mkv *.m4v *.webm *.gif")]
+        )
+        if not video_path:
+            return
+        output_dir = filedialog.askdirectory(parent=more_window, title="Folder for Scanned Pages")
+        if not output_dir:
+            return
+
+        progress = {'last_page': None, 'pages': 0, 'stats': None, 'error': None}
+
+        def on_page(index, page):
+            progress['last_page'] = page
+            progress['pages'] += 1
+
+        def worker():
+            try:
+                progress['stats'] = scan_video(video_path, output_dir, on_page)
+            except Exception as e:
+                progress['error'] = e
+
+        def poll():
+            nonlocal current_img, current_step
+            if not more_window.winfo_exists():
+                return
+            if progress['stats'] is None and progress['error'] is None:
+                btn_scan_video.config(text=f"Scanning... {progress['pages']} page(s)")
+                more_window.after(200, poll)
+                return
+            btn_scan_video.config(text="Scan Pages from Video", state="normal")
+            if progress['error'] is not None:
+                messagebox.showerror("Error", f"An error occurred: {progress['error']}")
+                return
+            stats = progress['stats']
+            if progress['last_page'] is not None:
+                # หน้าจากวิดีโอไม่ได้มาจากภาพนี้ คำนวณซ้ำไม่ได้ หน้าหลักจะเก็บเป็นภาพคงที่
+                current_img = progress['last_page']
+                current_step = None
+                update_preview(current_img)
+            messagebox.showinfo("Document Scanner",
+                                f"Saved {stats['pages']} page(s) from {stats['frames']} frame(s) "
+                                f"({stats['fps']:.1f} fps) to {output_dir}")
+
+        btn_scan_video.config(state="disabled")
+        threading.Thread(target=worker, daemon=True).start()
+        poll()
+    
     def update_entry_from_scale(scale_val, var):
         var.set(str(int(float(scale_val))))
     
@@ -120,7 +223,7 @@ def open_more_window(parent, img, callback):
         var.set(str(rounded_val))
     
     def on_apply():
-        callback(current_img)
+        callback(current_img, current_step)
         more_window.destroy()
     
     def on_cancel():
@@ -163,10 +266,33 @@ def open_more_window(parent, img, callback):
     
     color_levels_scale.configure(command=lambda val: update_entry_from_scale(val, color_levels_var))
     
+    palette_mode_frame = tk.Frame(pixel_tab)
+    palette_mode_frame.pack(fill="x", pady=5)
+    
+    ttk.Label(palette_mode_frame, text="Palette:", width=15, anchor="w").pack(side="left")
+    
+    # Uniform = Color Levels ระดับต่อช่องสี, Adaptive = Color Levels สีที่ fit จากภาพ
+    palette_mode_var = StringVar(value="Uniform")
+    palette_mode_combo = ttk.Combobox(palette_mode_frame, textvariable=palette_mode_var,
+                                      values=["Uniform", "Adaptive (k-means)"], state="readonly", width=18)
+    palette_mode_combo.pack(side="right")
+    palette_mode_combo.bind("<<ComboboxSelected>>", lambda e: apply_pixel_art())
+    
     btn_pixel = tk.Button(pixel_tab, text="Apply Pixel Art", command=apply_pixel_art,
                          height=2, bg="#4CAF50", fg="white")
     btn_pixel.pack(fill="x", padx=10, pady=10)
     
+    cartoon_quality_frame = tk.Frame(pixel_tab)
+    cartoon_quality_frame.pack(fill="x", pady=5)
+    
+    ttk.Label(cartoon_quality_frame, text="Cartoon Quality:", width=15, anchor="w").pack(side="left")
+    
+    # full = bilateral filter ที่ความละเอียดเต็ม (ช้ากับภาพใหญ่)
+    cartoon_quality_var = StringVar(value="balanced")
+    cartoon_quality_combo = ttk.Combobox(cartoon_quality_frame, textvariable=cartoon_quality_var,
+                                         values=list(CARTOON_QUALITY), state="readonly", width=18)
+    cartoon_quality_combo.pack(side="right")
+    
     btn_cartoon = tk.Button(pixel_tab, text="Apply Cartoon Effect", command=apply_cartoon,
                            height=2, bg="#2196F3", fg="white")
     btn_cartoon.pack(fill="x", padx=10, pady=5)
@@ -185,7 +311,11 @@ def open_more_window(parent, img, callback):
     sketch_blur_scale.set(131)
     sketch_blur_scale.pack(side="right", padx=5)
     
-    sketch_blur_scale.configure(command=lambda val: update_entry_from_scale(val, sketch_blur_var))
+    def on_sketch_blur_scale(val):
+        update_entry_from_scale(val, sketch_blur_var)
+        request_sketch()
+    
+    sketch_blur_scale.configure(command=on_sketch_blur_scale)
     
     sketch_intensity_frame = tk.Frame(sketch_tab)
     sketch_intensity_frame.pack(fill="x", pady=5)
@@ -200,7 +330,11 @@ def open_more_window(parent, img, callback):
     sketch_intensity_scale.set(256.0)
     sketch_intensity_scale.pack(side="right", padx=5)
     
-    sketch_intensity_scale.configure(command=lambda val: update_float_entry_from_scale(val, sketch_intensity_var))
+    def on_sketch_intensity_scale(val):
+        update_float_entry_from_scale(val, sketch_intensity_var)
+        request_sketch()
+    
+    sketch_intensity_scale.configure(command=on_sketch_intensity_scale)
     
     sketch_invert_frame = tk.Frame(sketch_tab)
     sketch_invert_frame.pack(fill="x", pady=5)
@@ -208,7 +342,7 @@ def open_more_window(parent, img, callback):
     ttk.Label(sketch_invert_frame, text="Invert Effect:", width=15, anchor="w").pack(side="left")
     
     sketch_invert_var = tk.BooleanVar(value=True)
-    sketch_invert_check = ttk.Checkbutton(sketch_invert_frame, variable=sketch_invert_var)
+    sketch_invert_check = ttk.Checkbutton(sketch_invert_frame, variable=sketch_invert_var, command=request_sketch)
     sketch_invert_check.pack(side="left")
     
     btn_sketch = tk.Button(sketch_tab, text="Apply Sketch Effect", command=apply_sketch,
@@ -225,6 +359,10 @@ def open_more_window(parent, img, callback):
                        height=2, bg="#FF9800", fg="white")
     btn_scan.pack(fill="x", padx=10, pady=10)
     
+    btn_scan_video = tk.Button(document_tab, text="Scan Pages from Video", command=apply_video_scan,
+                               height=2, bg="#795548", fg="white")
+    btn_scan_video.pack(fill="x", padx=10, pady=5)
+    
     # เพิ่ม Event Handler สำหรับการกด Enter ใน Entry
     def entry_update(event):
         # ระบุว่าการอัพเดตมาจาก widget ไหน
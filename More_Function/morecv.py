@@ -1,65 +1,261 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
+from Feature_Ex.channels import to_gray, to_bgr
+
+PIXEL_ART_MODES = ("uniform", "kmeans")
+
+# mini-batch k-means: จำนวนพิกเซลที่สุ่มมาใช้ fit, ขนาด batch และจำนวนรอบ
+PALETTE_SAMPLE = 20000
+PALETTE_BATCH = 1024
+PALETTE_ITERATIONS = 100
+
+# ระดับคุณภาพของ cartoon: ย่อภาพกี่เท่าก่อนทำ bilateral filter (None = ความละเอียดเต็มแบบเดิม)
+CARTOON_QUALITY = {'fast': 4, 'balanced': 2, 'full': None}
+
+# blur ของ sketch ที่ใหญ่กว่านี้ใช้ box filter 3 รอบแทน Gaussian (เวลาไม่ขึ้นกับขนาด kernel)
+EXACT_BLUR_MAX = 15
+# จำนวน blur plane ที่เก็บไว้ต่อภาพ (ภาพ 20 MP ใช้ 20 MB ต่อ plane)
+SKETCH_CACHE_SIZE = 4
+
+# ตารางค้นหาสีที่ใกล้ที่สุด: 5 bit ต่อช่อง = 32 x 32 x 32 ช่อง
+GRID_BITS = 5
+
+def fit_palette(pixels, n_colors, seed=0):
+    """
+    Fit n_colors palette colours to pixels (N x channels) with mini-batch k-means.
+
+    Centres start with k-means++ on a random sample and are then moved
+    towards the points of small random batches with a per-centre learning
+    rate of 1 / (points seen), so the cost does not depend on the image size.
+    """
+    rng = np.random.default_rng(seed)
+    pixels = pixels.reshape(len(pixels), -1).astype(np.float32)
+    if len(pixels) > PALETTE_SAMPLE:
+        pixels = pixels[rng.choice(len(pixels), PALETTE_SAMPLE, replace=False)]
+    n_colors = min(n_colors, len(pixels))
+
+    # k-means++
+    centers = [pixels[rng.integers(len(pixels))]]
+    dist = ((pixels - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, n_colors):
+        total = dist.sum()
+        if total <= 0:
+            break
+        center = pixels[rng.choice(len(pixels), p=dist / total)]
+        centers.append(center)
+        dist = np.minimum(dist, ((pixels - center) ** 2).sum(axis=1))
+    centers = np.array(centers, np.float32)
 
-## มีอีกวิธีนึงที่ใช้ K means clustering ในการลดสี แต่มันซับซ้อนกว่า
-def convert_to_pixel_art(img, pixel_size=8, color_levels=4):
+    counts = np.zeros(len(centers), np.float64)
+    batch_size = min(PALETTE_BATCH, len(pixels))
+    for _ in range(PALETTE_ITERATIONS):
+        batch = pixels[rng.choice(len(pixels), batch_size, replace=False)]
+        labels = _nearest(batch, centers)
+        for k in np.unique(labels):
+            members = batch[labels == k]
+            counts[k] += len(members)
+            rate = len(members) / counts[k]
+            centers[k] += rate * (members.mean(axis=0) - centers[k])
+
+    return np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+
+def _nearest(points, palette):
+    """Index of the closest palette colour for each point (only used on small arrays)."""
+    points = points.astype(np.float32)
+    palette = palette.astype(np.float32)
+    dist = (points * points).sum(axis=1)[:, None] - 2 * points @ palette.T + (palette * palette).sum(axis=1)
+    return dist.argmin(axis=1)
+
+def palette_lut(palette):
+    """
+    Precomputed nearest-colour table for a palette.
+
+    For 1-channel palettes it has 256 entries (one per gray level); for
+    3-channel palettes one per cell of a 32x32x32 grid over BGR, indexed by
+    the top GRID_BITS bits of each channel.
+    """
+    if palette.shape[1] == 1:
+        levels = np.arange(256, dtype=np.float32)[:, None]
+        return _nearest(levels, palette).astype(np.uint8)
+    cells = 1 << GRID_BITS
+    step = 256 // cells
+    centres = np.arange(cells, dtype=np.float32) * step + (step - 1) / 2.0
+    b, g, r = np.meshgrid(centres, centres, centres, indexing='ij')
+    grid = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1)
+    return _nearest(grid, palette).astype(np.uint8)
+
+def map_to_palette(img, palette, lut):
+    """Replace every pixel of img (gray, BGR or BGRA) by its palette colour via the lookup table."""
+    if img.ndim == 2:
+        return palette[:, 0][lut[img]]
+    color = img[:, :, :3]
+    shift = 8 - GRID_BITS
+    index = ((color[:, :, 0].astype(np.uint16) >> shift) << (2 * GRID_BITS)) \
+        | ((color[:, :, 1].astype(np.uint16) >> shift) << GRID_BITS) \
+        | (color[:, :, 2] >> shift)
+    mapped = palette[lut[index]]
+    if img.shape[2] == 4:
+        # alpha ไม่อยู่ใน palette ใช้ค่าเดิม
+        return np.dstack([mapped, img[:, :, 3]])
+    return mapped
+
+def convert_to_pixel_art(img, pixel_size=8, color_levels=4, mode="uniform", cache=None):
+    """
+    Pixelate img and reduce its colours.
+
+    mode "uniform" keeps color_levels levels per channel (integer division).
+    mode "kmeans" fits an adaptive palette of color_levels colours to the
+    downscaled image with mini-batch k-means and maps pixels through a
+    lookup table. cache is a dict (per source image) that keeps fitted
+    palettes per colour count, so moving the Pixel Size slider does not refit.
+    """
     height, width = img.shape[:2]
     # Calculate new dimensions
-    small_width = width // pixel_size
-    small_height = height // pixel_size
+    small_width = max(1, width // pixel_size)
+    small_height = max(1, height // pixel_size)
     
     # Resize image to small dimensions
     small_img = cv2.resize(img, (small_width, small_height), interpolation=cv2.INTER_LINEAR)
     
     # Reduce color palette
-    color_divisor = 256 // color_levels
-    small_img = (small_img // color_divisor) * color_divisor
+    if mode == "kmeans":
+        if cache is None:
+            cache = {}
+        if color_levels not in cache:
+            if small_img.ndim == 2:
+                pixels = small_img.reshape(-1, 1)
+            else:
+                pixels = small_img.reshape(-1, small_img.shape[2])[:, :3]
+            palette = fit_palette(pixels, color_levels)
+            cache[color_levels] = (palette, palette_lut(palette))
+        palette, lut = cache[color_levels]
+        small_img = map_to_palette(small_img, palette, lut)
+    else:
+        color_divisor = 256 // color_levels
+        small_img = (small_img // color_divisor) * color_divisor
     
     # Scale back up
     pixel_art = cv2.resize(small_img, (width, height), interpolation=cv2.INTER_NEAREST)
     
     return pixel_art
 
-def apply_cartoon_effect(img):
-    """Apply cartoon effect to image"""
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
+def cartoon_edges(gray):
+    """Black-on-white edge mask of the cartoon effect."""
     # Apply median blur
     gray = cv2.medianBlur(gray, 5)
     
     # Detect edges
-    edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
-                                cv2.THRESH_BINARY, 9, 9)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
+                                 cv2.THRESH_BINARY, 9, 9)
+
+def smooth_colors(img, quality="full"):
+    """
+    Flatten the colours with a bilateral filter.
+
+    Below 'full' the filter runs on a copy downscaled by CARTOON_QUALITY[quality]
+    with a proportionally smaller window and the result is resized back;
+    the cost falls with the square of the factor.
+    """
+    factor = CARTOON_QUALITY[quality]
+    if not factor:
+        return cv2.bilateralFilter(img, 9, 300, 300)
+
+    height, width = img.shape[:2]
+    small = cv2.resize(img, (max(1, width // factor), max(1, height // factor)),
+                       interpolation=cv2.INTER_AREA)
+    diameter = max(3, round(9 / factor) | 1)
+    small = cv2.bilateralFilter(small, diameter, 300, 300)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def apply_cartoon_effect(img, quality="full"):
+    """
+    Apply cartoon effect to image.
+
+    quality is one of CARTOON_QUALITY ('full' is the original full-resolution
+    bilateral filter). The edge mask is computed on a second thread while
+    the colours are smoothed.
+    """
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = to_bgr(img)
+
+    # Convert to grayscale (gray input stays single-channel throughout)
+    gray = to_gray(img)
     
-    # Apply bilateral filter for color smoothing
-    color = cv2.bilateralFilter(img, 9, 300, 300)
+    # เส้นขอบกับการลดสีไม่ขึ้นต่อกัน ทำพร้อมกันได้ (cv2 ปล่อย GIL)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        edges_future = pool.submit(cartoon_edges, gray)
+        
+        # Apply bilateral filter for color smoothing
+        color = smooth_colors(img, quality)
+        edges = edges_future.result()
     
     # Combine edges with color image
     cartoon = cv2.bitwise_and(color, color, mask=edges)
     
     return cartoon
 
-def apply_sketch_effect(img, blur_size=131, intensity=256.0, invert=True):
+def _box_widths(sigma, passes=3):
+    """Odd box widths whose repeated application approximates a Gaussian of sigma (Wells, 1986)."""
+    ideal = np.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    n_lower = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+                    / (-4 * lower - 4))
+    return [lower if i < n_lower else upper for i in range(passes)]
+
+def sketch_blur(img, blur_size):
+    """
+    GaussianBlur(img, (blur_size, blur_size), 0), approximated for large sizes.
+
+    Above EXACT_BLUR_MAX three box filters with the same sigma are used; a box
+    filter costs the same for any width, so a 201 px blur is as fast as a 31 px one.
+    """
+    if blur_size <= EXACT_BLUR_MAX:
+        return cv2.GaussianBlur(img, (blur_size, blur_size), 0)
+    # sigma ที่ cv2.GaussianBlur ใช้เมื่อส่ง sigma = 0
+    sigma = 0.3 * ((blur_size - 1) * 0.5 - 1) + 0.8
+    for width in _box_widths(sigma):
+        img = cv2.blur(img, (width, width))
+    return img
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def sketch_planes(img, blur_size, cache=None):
+    """
+    (gray, inverted_blurred) for the sketch effect; the expensive part.
+
+    cache is a dict (per source image) keyed by blur size that keeps the
+    last SKETCH_CACHE_SIZE planes, so changing intensity or invert only
+    redoes the divide.
+    """
+    if cache is not None and blur_size in cache:
+        return cache[blur_size]
+
+    gray = next(iter(cache.values()))[0] if cache else to_gray(img)
+    blurred = sketch_blur(255 - gray, blur_size)
+    planes = (gray, 255 - blurred)
+
+    if cache is not None:
+        if len(cache) >= SKETCH_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[blur_size] = planes
+    return planes
+
+def apply_sketch_effect(img, blur_size=131, intensity=256.0, invert=True, cache=None):
     
     if blur_size % 2 == 0:
         blur_size += 1
     
     blur_size = max(3, blur_size)
     
-    inverted_gray_img = 255 - gray
-    
-    blurred = cv2.GaussianBlur(inverted_gray_img, (blur_size, blur_size), 0)
-    
-    inverted_blurred = 255 - blurred
+    gray, inverted_blurred = sketch_planes(img, blur_size, cache)
     
     sketch = cv2.divide(gray, inverted_blurred, scale=intensity)
     
     if invert:
         sketch = 255 - sketch
-        
-    sketch_color = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-    
-    return sketch_color
\ No newline at end of file
+
+    # คืนค่าเป็นภาพเทาช่องเดียว ขยายเป็นสีตอนแสดงผล/บันทึกเท่านั้น
+    return sketch
@@ -10,7 +10,7 @@ def shear_image(image, shx, shy):
     new_width = int(cols + abs_shy * rows)
     new_height = int(rows + abs_shx * cols)
     
-    temp_img = np.zeros((new_height, new_width, 3), dtype=np.uint8)
+    temp_img = np.zeros((new_height, new_width) + image.shape[2:], dtype=image.dtype)
     
     x_offset = int((new_width - cols) / 2)
     y_offset = int((new_height - rows) / 2)
@@ -108,4 +108,58 @@ def rotate_image(image, angle):
     if result.shape[0] != rows or result.shape[1] != cols:
         result = cv2.resize(result, (cols, rows))
     
-    return result
\ No newline at end of file
+    return result
+
+def transform_matrix(width, height, tx=0, ty=0, sx=1.0, sy=1.0, shx=0.0, shy=0.0, angle=0):
+    """
+    Compose translate -> scale -> shear -> rotate into one 2x3 affine matrix.
+
+    Scale and rotation are taken about the image centre, as in scale_image
+    and rotate_image. Shear is also taken about the centre, so the result
+    differs from shear_image, which shears about the origin and shifts the
+    content inside an enlarged canvas.
+    """
+    cx, cy = width / 2, height / 2
+
+    translate = np.array([[1, 0, tx],
+                          [0, 1, ty],
+                          [0, 0, 1]], dtype=np.float64)
+
+    scale = np.array([[sx, 0, cx - sx * cx],
+                      [0, sy, cy - sy * cy],
+                      [0, 0, 1]], dtype=np.float64)
+
+    shear = np.array([[1, shx, -shx * cy],
+                      [shy, 1, -shy * cx],
+                      [0, 0, 1]], dtype=np.float64)
+
+    rotate = np.vstack([cv2.getRotationMatrix2D((cx, cy), angle, 1.0), [0, 0, 1]])
+
+    # เมทริกซ์ที่ทำทีหลังอยู่ทางซ้าย
+    M = rotate @ shear @ scale @ translate
+    return M[:2]
+
+def transform_image(image, tx=0, ty=0, sx=1.0, sy=1.0, shx=0.0, shy=0.0, angle=0, dst=None):
+    """
+    Apply translate, scale, shear and rotate with a single cv2.warpAffine.
+
+    Works for any channel count. The output has the size of the input; pass
+    dst (same shape and dtype as image) to write into an existing buffer.
+    """
+    rows, cols = image.shape[:2]
+
+    if (tx, ty, sx, sy, shx, shy, angle) == (0, 0, 1.0, 1.0, 0.0, 0.0, 0):
+        if dst is None:
+            return image.copy()
+        dst[...] = image
+        return dst
+
+    if dst is None:
+        dst = np.empty_like(image)
+
+    M = transform_matrix(cols, rows, tx, ty, sx, sy, shx, shy, angle)
+
+    # ย่อภาพมาก ๆ ใช้ INTER_AREA ไม่ได้ใน warpAffine จึงใช้ LINEAR ทุกกรณี
+    cv2.warpAffine(image, M, (cols, rows), dst=dst, flags=cv2.INTER_LINEAR,
+                   borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    return dst
@@ -4,6 +4,10 @@ import cv2
 import numpy as np
 from PIL import Image, ImageTk
 from Transformation.Image_Tran import *
+from Core.edit_graph import EditGraph
+from Feature_Ex.adjust_pipeline import make_preview_proxy
+from Feature_Ex.preview_scheduler import PreviewScheduler
+from Feature_Ex.channels import to_pil_image
 
 def open_transformation_window(root, img_cv,img_display, display_callback):
     if img_cv is None:
@@ -129,7 +133,14 @@ def open_transformation_window(root, img_cv,img_display, display_callback):
     angle_entry = tk.Entry(angle_frame, textvariable=angle_var, width=6)
     angle_entry.pack(side="left", padx=5)
     
-    current_preview = {'transformed_img': None}
+    source = img_cv
+    if source.dtype != np.uint8:
+        source = np.clip(source, 0, 255).astype(np.uint8)
+
+    # preview แปลงภาพย่อขนาดไม่เกินจอ ภาพเต็มแปลงครั้งเดียวตอน Apply
+    img_proxy = make_preview_proxy(source, root.winfo_screenwidth(), root.winfo_screenheight())
+    proxy_ratio = img_proxy.shape[1] / source.shape[1]
+    preview_graph = EditGraph(img_proxy, cache_bytes=64 * 1024 * 1024)
     
     def validate_entry(var, min_val, max_val, is_int=False):
         try:
@@ -154,36 +165,26 @@ def open_transformation_window(root, img_cv,img_display, display_callback):
         validate_entry(angle_var, -360, 360)  # แก้จาก -50, 50 เป็น -360, 360
         update_preview()
 
-    def update_preview(val=None):
-        transformed_img = img_cv.copy()
-        
-        if tx_var.get() != 0 or ty_var.get() != 0:
-            transformed_img = translate_image(transformed_img, tx_var.get(), ty_var.get())
-        
-        if sx_var.get() != 1.0 or sy_var.get() != 1.0:
-            transformed_img = scale_image(transformed_img, sx_var.get(), sy_var.get())
-        
-        if shx_var.get() != 0.0 or shy_var.get() != 0.0:
-            transformed_img = shear_image(transformed_img, shx_var.get(), shy_var.get())
-        
-        if angle_var.get() != 0:
-            transformed_img = rotate_image(transformed_img, angle_var.get())
-        
-        if transformed_img.dtype != np.uint8:
-            transformed_img = np.clip(transformed_img, 0, 255).astype(np.uint8)
-        
-        current_preview['transformed_img'] = transformed_img
-        
-        canvas_width = preview_canvas.winfo_width()
-        canvas_height = preview_canvas.winfo_height()
-        
-        if canvas_width <= 1:
-            canvas_width = window_width - 300
-        if canvas_height <= 1:
-            canvas_height = window_height - 40
+    def current_params():
+        return (tx_var.get(), ty_var.get(), sx_var.get(), sy_var.get(),
+                shx_var.get(), shy_var.get(), angle_var.get())
+
+    def compute_transform(params):
+        tx, ty, sx, sy, shx, shy, angle = params
+        # รวม translate/scale/shear/rotate เป็นเมทริกซ์เดียว interpolate ครั้งเดียว
+        return transform_image(source, tx, ty, sx, sy, shx, shy, angle)
+
+    def render_preview(params, canvas_width, canvas_height):
+        # ทำงานบน worker thread ห้ามแตะ widget ของ Tk
+        tx, ty, sx, sy, shx, shy, angle = params
+        # ระยะเลื่อนเป็น pixel ของภาพเต็ม ต้องย่อตามภาพ preview ด้วย
+        preview_graph.set_chain([(transform_image, dict(tx=tx * proxy_ratio, ty=ty * proxy_ratio,
+                                                        sx=sx, sy=sy, shx=shx, shy=shy, angle=angle))])
+        transformed_img = preview_graph.output()
+        if scheduler.cancelled():
+            return None
             
-        img_rgb = cv2.cvtColor(transformed_img, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb)
+        img_pil = to_pil_image(transformed_img)
         
         # แก้ไขการปรับขนาดภาพให้พอดีกับ canvas ทั้งระหว่างและหลังการแปลง
         img_width, img_height = img_pil.size
@@ -192,12 +193,28 @@ def open_transformation_window(root, img_cv,img_display, display_callback):
         new_height = int(img_height * scale_factor)
         img_pil = img_pil.resize((new_width, new_height), Image.LANCZOS)
         
+        return img_pil, canvas_width, canvas_height
+
+    def show_preview(rendered):
+        img_pil, canvas_width, canvas_height = rendered
         img_tk = ImageTk.PhotoImage(img_pil)
         
         preview_canvas.delete("all")
         preview_canvas.create_image(canvas_width//2, canvas_height//2, anchor=tk.CENTER, image=img_tk)
         preview_canvas.image = img_tk
-        return transformed_img
+
+    scheduler = PreviewScheduler(preview_canvas, render_preview, show_preview)
+
+    def update_preview(val=None):
+        canvas_width = preview_canvas.winfo_width()
+        canvas_height = preview_canvas.winfo_height()
+        
+        if canvas_width <= 1:
+            canvas_width = window_width - 300
+        if canvas_height <= 1:
+            canvas_height = window_height - 40
+
+        scheduler.request(current_params(), canvas_width, canvas_height)
     
     def on_resize(event):
         update_preview()
@@ -250,7 +267,9 @@ def open_transformation_window(root, img_cv,img_display, display_callback):
         update_preview()
     
     def apply_changes():
-        display_callback(current_preview['transformed_img'])
+        params = current_params()
+        names = ('tx', 'ty', 'sx', 'sy', 'shx', 'shy', 'angle')
+        display_callback(compute_transform(params), ("Transform", transform_image, dict(zip(names, params))))
         trans_window.destroy()
     
     # Buttons
@@ -1,4 +1,7 @@
 # main.py
+import os
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from ttkbootstrap import Style
@@ -11,6 +14,9 @@ from Transformation.P2_Img_Trans import *
 from More_Function.more import *
 from Feature_Ex.adaptive_threshold import *
 from Feature_Ex.bg_removal_window import create_bg_removal_window
+from Core.document import ImageDocument
+from Core.image_loader import load_preview, BackgroundLoader
+from Core.display_cache import DisplayPyramid
 
 
 
@@ -27,29 +33,116 @@ CANVAS_HEIGHT = 750
 
 style = Style(theme='darkly')
 
+# หน่วยความจำสูงสุดของประวัติ undo/redo (ส่วนที่เกินจะย้ายไปเก็บบนดิสก์)
+HISTORY_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# หน่วยความจำสูงสุดของผลลัพธ์แต่ละขั้นตอนที่เก็บไว้ (เปิด/ปิดหรือสลับขั้นแล้วไม่ต้องคำนวณใหม่ทั้งหมด)
+STEPS_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# หน่วยความจำสูงสุดของภาพที่แก้ไข (ภาพปัจจุบัน + ต้นฉบับ + ผลแต่ละขั้น + display + ประวัติ)
+# ถ้าเกิน ต้นฉบับจะถูกย้ายไปไว้บนดิสก์
+DOCUMENT_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# รอให้หยุดลากขอบหน้าต่างก่อนค่อยวาดภาพใหม่ (ms)
+RESIZE_DEBOUNCE_MS = 80
+
 # Global variables
 file_path = None
-img_original = None
-img_display = None
-img_cv = None
+# ภาพที่กำลังแก้ไข ทุกหน้าต่างได้ภาพแบบอ่านอย่างเดียวจาก document โดยไม่ต้อง copy
+document = ImageDocument(max_bytes=DOCUMENT_MEMORY_BUDGET, history_bytes=HISTORY_MEMORY_BUDGET,
+                         graph_bytes=STEPS_MEMORY_BUDGET)
+loading_preview = None
+resize_job = None
+
+def update_status():
+    status_label.config(text=document.memory_text() if document.loaded else "")
+
+# รายการขั้นตอนการแก้ไข: ✓ = เปิดใช้, ✗ = ปิดอยู่
+def refresh_steps(select=None):
+    if select is None:
+        selection = steps_list.curselection()
+        select = selection[0] if selection else None
+    steps_list.delete(0, tk.END)
+    for node in document.steps:
+        steps_list.insert(tk.END, f"{'✓' if node.enabled else '✗'} {node.label}")
+    if select is not None and 0 <= select < steps_list.size():
+        steps_list.selection_set(select)
+
+def selected_step():
+    selection = steps_list.curselection()
+    if not selection:
+        return None, None
+    index = selection[0]
+    return index, document.steps[index]
+
+def edit_steps(change, select):
+    # คำนวณใหม่เฉพาะขั้นที่อยู่หลังจุดที่เปลี่ยน ผลของขั้นก่อนหน้าอยู่ใน cache แล้ว
+    status_label.config(text="Updating steps...")
+    root.update_idletasks()
+    try:
+        change()
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not apply the steps: {e}")
+    display_image()
+    update_status()
+    refresh_steps(select)
+
+def toggle_step(event=None):
+    index, node = selected_step()
+    if node is not None:
+        edit_steps(lambda: document.set_step_enabled(node.id, not node.enabled), index)
+
+def move_step_up():
+    index, node = selected_step()
+    if node is not None and index > 0:
+        edit_steps(lambda: document.move_step(node.id, index - 1), index - 1)
+
+def move_step_down():
+    index, node = selected_step()
+    if node is not None and index < len(document.steps) - 1:
+        edit_steps(lambda: document.move_step(node.id, index + 1), index + 1)
+
+def remove_step():
+    index, node = selected_step()
+    if node is not None:
+        edit_steps(lambda: document.remove_step(node.id), max(0, index - 1))
 
 # Open Image
 def open_image():
-    global file_path, img_original, img_display, img_cv
-    file_path = filedialog.askopenfilename(
+    global file_path, loading_preview
+    path = filedialog.askopenfilename(
         title="Open Image File",
         filetypes=[("Image files", "*.png *.jpg *.jpeg *.gif *.bmp *.ico")]
     )
-    if file_path:
-        img_original = cv2.imread(file_path)
-        if img_original is None:
-            messagebox.showerror("Error", f"Unable to open image at {file_path}")
-            return
-        img_cv = img_original.copy()
-        img_display = img_original.copy()
-        display_image(img_display)
-    else:
+    if not path:
         messagebox.showerror("Error", "No image selected.")
+        return
+
+    file_path = path
+    document.clear()
+    refresh_steps()
+
+    # แสดง Exif thumbnail หรือภาพที่ decode แบบย่อก่อน แล้วค่อยโหลดภาพเต็มเบื้องหลัง
+    loading_preview = load_preview(path, max(canvas.winfo_width(), CANVAS_WIDTH // 2),
+                                   max(canvas.winfo_height(), CANVAS_HEIGHT // 2))
+    if loading_preview is not None:
+        display_image()
+    status_label.config(text=f"Loading {os.path.basename(path)}...")
+
+    image_loader.load(path, lambda img: on_image_loaded(path, img))
+
+def on_image_loaded(path, img):
+    global loading_preview
+    loading_preview = None
+    status_label.config(text="")
+    if img is None:
+        messagebox.showerror("Error", f"Unable to open image at {path}")
+        return
+    # ต้นฉบับ ภาพปัจจุบัน และภาพที่แสดง ใช้ buffer เดียวกันจนกว่าจะมีการแก้ไข
+    document.load(path, img)
+    display_image()
+    update_status()
+    refresh_steps()
 
 # Show Image Properties
 def show_image_properties():
@@ -64,18 +157,11 @@ def show_image_properties():
         messagebox.showerror("Error", "No image loaded. Please open an image first.")
 
 # Display Image
-def display_image(img_cv):
-    global img_display
-    if img_cv is None:
+def display_image():
+    if not document.loaded and loading_preview is None:
         messagebox.showerror("Error", "No image to display.")
         return
 
-    if img_cv.dtype != np.uint8:
-        img_cv = np.clip(img_cv, 0, 255).astype(np.uint8)
-    
-    img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-    img_pil = Image.fromarray(img_rgb)
-    
     canvas_width = canvas.winfo_width()
     canvas_height = canvas.winfo_height()
     
@@ -84,7 +170,11 @@ def display_image(img_cv):
     if canvas_height <= 1:
         canvas_height = CANVAS_HEIGHT
     
-    img_pil.thumbnail((canvas_width, canvas_height))
+    # document สร้าง pyramid ใหม่เฉพาะตอนที่ภาพเปลี่ยน ตอน resize ใช้ level ที่ใกล้ขนาด canvas ที่สุด
+    if document.loaded:
+        img_pil = document.render(canvas_width, canvas_height)
+    else:
+        img_pil = DisplayPyramid(loading_preview).render(canvas_width, canvas_height)
     img_tk = ImageTk.PhotoImage(img_pil)
     
     canvas.delete("all")
@@ -93,15 +183,36 @@ def display_image(img_cv):
 
 # Reset Image
 def reset_image():
-    global img_display, img_cv
-    if img_original is not None:
-        img_cv = img_original.copy()
-        img_display = img_original.copy()
-        display_image(img_display)
+    if document.loaded:
+        document.reset()
+        display_image()
+        update_status()
+        refresh_steps()
+
+# ใช้ภาพใหม่เป็นภาพปัจจุบัน เพิ่มเป็นขั้นตอนใหม่และบันทึกลงประวัติ undo
+# document รับ array ไปเลย (ทำเป็นอ่านอย่างเดียว) ไม่ต้อง copy
+# step = (label, op, params) ใช้คำนวณขั้นนี้ใหม่เมื่อขั้นก่อนหน้าถูกปิดหรือสลับลำดับ
+def commit_image(new_img, step=None):
+    document.commit(new_img, step)
+    display_image()
+    update_status()
+    refresh_steps()
+
+def undo(event=None):
+    if document.undo():
+        display_image()
+        update_status()
+        refresh_steps()
+
+def redo(event=None):
+    if document.redo():
+        display_image()
+        update_status()
+        refresh_steps()
 
 # Save Image
 def save_image():
-    if img_cv is None:
+    if not document.loaded:
         messagebox.showerror("Error", "No image to save. Please open an image first.")
         return
         
@@ -116,86 +227,133 @@ def save_image():
     
     if file_path:
         try:
-            cv2.imwrite(file_path, img_cv)
+            cv2.imwrite(file_path, document.current)
             messagebox.showinfo("Success", "Image saved successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save image: {str(e)}")
 
 def apply_grayscale_luminosity():
-    global img_display, img_cv, img_original
-    if img_cv is None:  
+    if not document.loaded:  
         messagebox.showerror("Error", "No image loaded.")
         return
     
-    img_display = Grayscale_Luminosity(img_cv) 
-    img_cv = img_display.copy()
-    display_image(img_display)
+    commit_image(Grayscale_Luminosity(document.current), ("Gray", Grayscale_Luminosity, {}))
 
 def apply_black_and_white():
-    global img_cv, img_display
-    if img_cv is None:  
+    if not document.loaded:  
         messagebox.showerror("Error", "No image loaded.")
         return
     
-    create_adaptive_threshold_window(root, img_cv, on_black_white_apply) 
+    create_adaptive_threshold_window(root, document.current, on_black_white_apply) 
 
-def on_black_white_apply(processed_img):
-    global img_cv, img_display
-    img_cv = processed_img.copy()
-    img_display = processed_img.copy()
-    display_image(img_display)
+def on_black_white_apply(processed_img, step=None):
+    commit_image(processed_img, step)
     
-def on_adjust_apply(adjusted_img):
-    global img_cv, img_display
-    img_cv = adjusted_img
-    img_display = adjusted_img.copy()
-    display_image(img_display)
+def on_adjust_apply(adjusted_img, step=None):
+    commit_image(adjusted_img, step)
 
 def open_adjust_window():
-    create_adjust_window(root, img_cv, on_adjust_apply)
+    create_adjust_window(root, document.current, on_adjust_apply)
 
-def on_transform_apply(transformed_img):
-    global img_cv, img_display
-    img_cv = transformed_img.copy()
-    img_display = transformed_img.copy()
-    display_image(img_display)
+def on_transform_apply(transformed_img, step=None):
+    commit_image(transformed_img, step)
 
 def open_trans_window():
-    global img_cv, img_display
-    if img_cv is None:
+    if not document.loaded:
         messagebox.showerror("Error", "No image loaded. Please open an image first.")
         return
-    open_transformation_window(root, img_cv, img_display, on_transform_apply)
+    open_transformation_window(root, document.current, document.current, on_transform_apply)
 
 def open_more_functions():
-    global img_cv, img_display
-    if img_cv is None:
+    if not document.loaded:
         messagebox.showerror("Error", "No image loaded. Please open an image first.")
         return
-    open_more_window(root, img_cv, on_more_apply)
+    open_more_window(root, document.current, on_more_apply)
 
-def on_more_apply(processed_img):
-    global img_cv, img_display
-    img_cv = processed_img.copy()
-    img_display = processed_img.copy()
-    display_image(img_display)
+def on_more_apply(processed_img, step=None):
+    commit_image(processed_img, step)
 
 def on_resize(event):
-    if img_display is not None:
-        display_image(img_display)
+    # รวม <Configure> ที่มาติด ๆ กันตอนลากขอบหน้าต่าง วาดใหม่ครั้งเดียวเมื่อหยุดลาก
+    global resize_job
+    if resize_job is not None:
+        root.after_cancel(resize_job)
+    resize_job = root.after(RESIZE_DEBOUNCE_MS, redraw_after_resize)
+
+def redraw_after_resize():
+    global resize_job
+    resize_job = None
+    if document.loaded or loading_preview is not None:
+        display_image()
         
 def open_bg_removal_window():
-    global img_cv, img_display
-    if img_cv is None:
+    if not document.loaded:
         messagebox.showerror("Error", "No image loaded. Please open an image first.")
         return
-    create_bg_removal_window(root, img_cv, on_bg_removal_apply)
+    create_bg_removal_window(root, document.current, on_bg_removal_apply)
 
-def on_bg_removal_apply(processed_img):
-    global img_cv, img_display
-    img_cv = processed_img.copy()
-    img_display = processed_img.copy()
-    display_image(img_display)
+def on_bg_removal_apply(processed_img, step=None):
+    commit_image(processed_img, step)
+
+# ใช้ recipe (JSON/YAML แบบเดียวกับ batch) กับทุกเฟรมของวิดีโอหรือ GIF แบบเคลื่อนไหว
+def process_video_file():
+    from Batch.recipe import load_recipe
+    from Batch.video_process import process_video
+
+    input_path = filedialog.askopenfilename(
+        title="Open Video or GIF",
+        filetypes=[("Video / GIF", "*.mp4 *.avi *.mov *.mkv *.m4v *.webm *.gif")]
+    )
+    if not input_path:
+        return
+    recipe_path = filedialog.askopenfilename(
+        title="Open Recipe",
+        filetypes=[("Recipe", "*.json *.yaml *.yml")]
+    )
+    if not recipe_path:
+        return
+    try:
+        steps = load_recipe(recipe_path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Invalid recipe: {e}")
+        return
+    ext = ".gif" if input_path.lower().endswith(".gif") else ".avi"
+    output_path = filedialog.asksaveasfilename(
+        title="Save Processed Video",
+        defaultextension=ext,
+        filetypes=[("GIF", "*.gif"), ("AVI (Motion JPEG)", "*.avi"), ("MP4", "*.mp4")]
+    )
+    if not output_path:
+        return
+
+    progress = {'frames': 0, 'fps': 0.0, 'result': None, 'error': None}
+    started = time.perf_counter()
+
+    def on_progress(stats):
+        progress['frames'] = stats['frames']
+        progress['fps'] = stats['frames'] / (time.perf_counter() - started)
+
+    def worker():
+        try:
+            progress['result'] = process_video(input_path, output_path, steps, on_progress=on_progress)
+        except Exception as e:
+            progress['error'] = e
+
+    def poll():
+        if progress['result'] is None and progress['error'] is None:
+            status_label.config(text=f"Video: {progress['frames']} frames, {progress['fps']:.1f} fps")
+            root.after(200, poll)
+            return
+        update_status()
+        if progress['error'] is not None:
+            messagebox.showerror("Error", f"Video processing failed: {progress['error']}")
+        else:
+            stats = progress['result']
+            messagebox.showinfo("Video", f"Processed {stats['frames']} frame(s) in {stats['seconds']:.1f} s "
+                                         f"({stats['fps']:.1f} fps)\nSaved to {output_path}")
+
+    threading.Thread(target=worker, daemon=True).start()
+    poll()
 
 frame = tk.Frame(root)
 frame.pack(side="left", padx=10, pady=20, fill="y")
@@ -205,6 +363,8 @@ canvas.pack(side="right", padx=10, pady=10, fill="both", expand=True)
 
 canvas.bind("<Configure>", on_resize)
 
+image_loader = BackgroundLoader(root)
+
 open_button = tk.Button(frame, text="Open Image", command=open_image, 
                        width=20, height=2, bg="#4CAF50", fg="white")
 open_button.grid(row=0, column=0, padx=10, pady=5)
@@ -250,7 +410,43 @@ bg_removal_button = tk.Button(frame, text="Remove Background",
                            width=20, height=2, bg="#E91E63", fg="white")
 bg_removal_button.grid(row=9, column=0, padx=10, pady=5)
 
+undo_button = tk.Button(frame, text="Undo", command=undo,
+                       width=20, height=2, bg="#607D8B", fg="white")
+undo_button.grid(row=10, column=0, padx=10, pady=5)
+
+redo_button = tk.Button(frame, text="Redo", command=redo,
+                       width=20, height=2, bg="#607D8B", fg="white")
+redo_button.grid(row=11, column=0, padx=10, pady=5)
+
+video_button = tk.Button(frame, text="Process Video / GIF", command=process_video_file,
+                        width=20, height=2, bg="#795548", fg="white")
+video_button.grid(row=12, column=0, padx=10, pady=5)
+
+# ขั้นตอนการแก้ไข: เลือกแล้วเปิด/ปิด (ดับเบิลคลิก) สลับลำดับ หรือลบออกได้
+steps_frame = tk.LabelFrame(frame, text="Steps")
+steps_frame.grid(row=13, column=0, padx=10, pady=5, sticky="ew")
+
+steps_list = tk.Listbox(steps_frame, height=6, exportselection=False)
+steps_list.pack(fill="x", padx=5, pady=5)
+steps_list.bind("<Double-Button-1>", toggle_step)
+
+steps_buttons = tk.Frame(steps_frame)
+steps_buttons.pack(fill="x", padx=5, pady=(0, 5))
+
+tk.Button(steps_buttons, text="On/Off", command=toggle_step, width=6,
+          bg="#607D8B", fg="white").pack(side="left", padx=1)
+tk.Button(steps_buttons, text="Up", command=move_step_up, width=4,
+          bg="#607D8B", fg="white").pack(side="left", padx=1)
+tk.Button(steps_buttons, text="Down", command=move_step_down, width=5,
+          bg="#607D8B", fg="white").pack(side="left", padx=1)
+tk.Button(steps_buttons, text="Remove", command=remove_step, width=6,
+          bg="#f44336", fg="white").pack(side="left", padx=1)
+
+root.bind("<Control-z>", undo)
+root.bind("<Control-y>", redo)
+
 status_label = tk.Label(root, text="", padx=20, pady=10, font=("Arial", 12))
 status_label.pack(side="bottom")
 
-root.mainloop()
\ No newline at end of file
+root.mainloop()
+document.close()
\ No newline at end of file
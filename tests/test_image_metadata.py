@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from Core.image_metadata import read_image_header
+
+def _imread_bit_depth(path):
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    channels = img.shape[2] if img.ndim == 3 else 1
+    return img.dtype.itemsize * 8 * channels
+
+class ReadImageHeaderBitDepthTest(unittest.TestCase):
+    """bit_depth from the header must match what cv2.imread(IMREAD_UNCHANGED) returns."""
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def _write(self, name, img):
+        path = os.path.join(self._dir.name, name)
+        self.assertTrue(cv2.imwrite(path, img))
+        return path
+
+    def _check(self, name, img, expected):
+        path = self._write(name, img)
+        self.assertEqual(_imread_bit_depth(path), expected)
+        self.assertEqual(read_image_header(path)['bit_depth'], expected)
+
+    def test_png_16bit_rgb(self):
+        self._check('rgb16.png', np.full((8, 10, 3), 40000, np.uint16), 48)
+
+    def test_png_16bit_rgba(self):
+        self._check('rgba16.png', np.full((8, 10, 4), 40000, np.uint16), 64)
+
+    def test_png_16bit_gray(self):
+        self._check('gray16.png', np.full((8, 10), 40000, np.uint16), 16)
+
+    def test_png_8bit_rgb(self):
+        self._check('rgb8.png', np.full((8, 10, 3), 200, np.uint8), 24)
+
+    def test_tiff_16bit_rgb(self):
+        self._check('rgb16.tif', np.full((8, 10, 3), 40000, np.uint16), 48)
+
+if __name__ == '__main__':
+    unittest.main()